@@ -0,0 +1,122 @@
+import argparse
+import http.client
+import os
+import random
+import sys
+import threading
+import time
+import urllib.parse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from synthetic_data import SCALES, BENCH_PASSWORD, generate_movies
+
+ROUTE_WEIGHTS = {'/browse': 40, '/movie': 30, '/recommend': 20, '/rate_movie': 10}
+ALGO_TYPES = ('content', 'collaborative', 'item_collaborative', 'hybrid')
+
+
+class LoadWorker(threading.Thread):
+    # One simulated user: logs in once, then issues a weighted mix of route
+    # requests until the deadline, recording (route, seconds, status) samples.
+    def __init__(self, host, port, user_number, movie_names, deadline, warmup_until, seed):
+        super().__init__(daemon=True)
+        self.host, self.port = host, port
+        self.user_number = user_number
+        self.movie_names = movie_names
+        self.deadline, self.warmup_until = deadline, warmup_until
+        self.random = random.Random(seed)
+        self.cookie = None
+        self.samples = []
+
+    def request(self, method, path, form=None):
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        try:
+            headers = {'Accept-Encoding': 'gzip'}
+            if self.cookie: headers['Cookie'] = self.cookie
+            body = None
+            if form is not None:
+                body = urllib.parse.urlencode(form)
+                headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            response.read()
+            set_cookie = response.getheader('Set-Cookie')
+            if set_cookie: self.cookie = set_cookie.split(';', 1)[0]
+            return response.status
+        finally:
+            connection.close()
+
+    def login(self):
+        self.request('POST', '/login', {'email': f"bench{self.user_number}@example.com", 'password': BENCH_PASSWORD})
+        return self.cookie is not None
+
+    def next_request(self):
+        route = self.random.choices(list(ROUTE_WEIGHTS), weights=list(ROUTE_WEIGHTS.values()))[0]
+        movie_id = self.random.randint(1, len(self.movie_names))
+        if route == '/browse':
+            if self.random.random() < 0.3:
+                return route, 'GET', f"/browse?search_query={urllib.parse.quote(self.movie_names[movie_id - 1].split()[0])}", None
+            return route, 'GET', f"/browse?page={self.random.randint(1, 5)}", None
+        if route == '/movie':
+            return route, 'GET', f"/movie?id={movie_id}", None
+        if route == '/recommend':
+            return route, 'POST', '/recommend', {'movie_name': self.movie_names[movie_id - 1], 'algo_type': self.random.choice(ALGO_TYPES)}
+        return route, 'POST', '/rate_movie', {'movie_id': movie_id, 'rating': self.random.randint(1, 5)}
+
+    def run(self):
+        try:
+            if not self.login():
+                print(f"Login failed for bench{self.user_number}@example.com")
+                return
+        except OSError as e:
+            print(f"Login failed for bench{self.user_number}@example.com: {e}")
+            return
+        while time.perf_counter() < self.deadline:
+            route, method, path, form = self.next_request()
+            started = time.perf_counter()
+            try:
+                status = self.request(method, path, form)
+            except OSError:
+                status = 0
+            if started >= self.warmup_until:
+                self.samples.append((route, time.perf_counter() - started, status))
+
+def summarize(samples, measured_seconds):
+    print(f"{'route':<14}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    by_route = {}
+    for route, seconds, status in samples:
+        by_route.setdefault(route, []).append((seconds, status))
+    for route in sorted(by_route) + ['total']:
+        entries = samples if route == 'total' else by_route[route]
+        latencies = np.array([entry[-2] for entry in entries]) * 1000
+        # 2xx and the redirects handlers answer POSTs with count as success.
+        errors = sum(1 for entry in entries if not 200 <= entry[-1] < 400)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (0, 0, 0)
+        print(f"{route:<14}{len(entries):>10}{errors:>8}{len(entries) / measured_seconds:>10.1f}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}{latencies.max() if len(latencies) else 0:>10.1f}")
+
+def run(host, port, concurrency, duration, warmup, n_movies, seed):
+    _, _, movies = generate_movies(np.random.default_rng(seed), n_movies)
+    movie_names = movies['Name'].tolist()
+    started = time.perf_counter()
+    workers = [LoadWorker(host, port, number, movie_names, started + warmup + duration, started + warmup, seed + number)
+               for number in range(1, concurrency + 1)]
+    for worker in workers: worker.start()
+    for worker in workers: worker.join()
+    samples = [sample for worker in workers for sample in worker.samples]
+    if not samples:
+        print("No requests completed; is the server running and loaded with synthetic_data.py?")
+        return
+    summarize(samples, duration)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drive a running server with concurrent logged-in users and report latency percentiles.")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--concurrency', type=int, default=32, help='simulated users, each logged in as a different bench user')
+    parser.add_argument('--duration', type=float, default=60.0, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=10.0, help='seconds of traffic before measuring starts')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small', help='must match the scale passed to synthetic_data.py')
+    parser.add_argument('--movies', type=int)
+    parser.add_argument('--seed', type=int, default=42, help='must match the seed passed to synthetic_data.py')
+    args = parser.parse_args()
+    run(args.host, args.port, args.concurrency, args.duration, args.warmup, args.movies or SCALES[args.scale]['movies'], args.seed)
@@ -0,0 +1,129 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db_pool
+import generate_similarity
+from synthetic_data import SCALES, generate_dataset
+
+
+class StandInCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self._rows = []
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        # Only the statements the benchmarked code issues are answered; DDL and
+        # writes are accepted and discarded so only client-side cost is measured.
+        self._rows = []
+        if 'FROM rating' in sql: self._rows = self.connection.tables.get('rating', [])
+        elif 'FROM movie' in sql: self._rows = self.connection.tables.get('movie', [])
+        self.rowcount = len(self._rows)
+        return self.rowcount
+
+    def executemany(self, sql, rows):
+        self.connection.rows_written += len(rows)
+        self.rowcount = len(rows)
+        return self.rowcount
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+
+class StandInConnection:
+    # Local stand-in for a pooled pymysql connection, serving DictCursor-style
+    # rows from memory so the benchmarks run without a MySQL server.
+    def __init__(self, tables):
+        self.tables = tables
+        self.rows_written = 0
+
+    def cursor(self):
+        return StandInCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def as_rows(columns):
+    names = list(columns.keys())
+    return [dict(zip(names, values)) for values in zip(*(columns[name].tolist() for name in names))]
+
+def timed(name, fn, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    print(f"{name:<40} min {min(timings) * 1000:10.1f} ms   median {statistics.median(timings) * 1000:10.1f} ms   ({repeat} runs)")
+    return result
+
+def run(scale, repeat=3, users=100, use_mysql=False, seed=42):
+    print(f"Generating synthetic dataset {scale}...")
+    dataset = generate_dataset(scale, seed)
+    tables = {'movie': as_rows(dataset['movie']), 'rating': as_rows(dataset['rating'])}
+    if use_mysql:
+        pool = db_pool.get_pool(min_size=1, max_size=4)
+        connection_for = pool.acquire
+    else:
+        stand_in = StandInConnection(tables)
+        connection_for = lambda: stand_in
+        generate_similarity.connect_db = connection_for
+
+    movies = generate_similarity.get_movies() if use_mysql else tables['movie']
+    sources, targets, scores = timed('calculate_similarity', lambda: generate_similarity.calculate_similarity(movies), repeat)
+    print(f"{'':<40} {len(sources)} pairs for {len(movies)} movies")
+    timed('save_similarity', lambda: generate_similarity.save_similarity(sources, targets, scores), repeat)
+
+    # Imported late: server builds its template environment and caches at import time.
+    import server
+    connection = connection_for()
+    try:
+        timed('collab_model.load', lambda: server.collab_model.load(connection), repeat)
+        sample = np.random.default_rng(seed).choice(dataset['rating']['User_id'], size=users)
+        handler = server.MyHandler.__new__(server.MyHandler)
+        def recommend_sample():
+            for user_id in sample.tolist():
+                handler.get_collaborative_recommendations(user_id, connection)
+        timed(f'get_collaborative_recommendations x{users}', recommend_sample, repeat)
+    finally:
+        connection.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the offline similarity job and online collaborative scoring on synthetic data.")
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--movies', type=int)
+    parser.add_argument('--users', type=int)
+    parser.add_argument('--ratings', type=int)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--sample-users', type=int, default=100, help='users scored per get_collaborative_recommendations run')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--mysql', action='store_true', help='run against the local MySQL database loaded by synthetic_data.py instead of the in-memory stand-in')
+    parser.add_argument('--db', default='movie_bench')
+    args = parser.parse_args()
+
+    scale = dict(SCALES[args.scale])
+    for key in ('movies', 'users', 'ratings'):
+        if getattr(args, key): scale[key] = getattr(args, key)
+    db_pool.DB_CONFIG['db'] = args.db
+    run(scale, args.repeat, args.sample_users, args.mysql, args.seed)
@@ -0,0 +1,118 @@
+import argparse
+import os
+import sys
+import numpy as np
+from werkzeug.security import generate_password_hash
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db_pool
+from generate_similarity import load_data_infile
+
+SCALES = {
+    'small': {'movies': 10000, 'users': 20000, 'ratings': 1000000},
+    'large': {'movies': 100000, 'users': 200000, 'ratings': 10000000},
+}
+VOCABULARY_SIZE = 20000
+WORDS_PER_DESCRIPTION = 40
+BENCH_PASSWORD = 'bench-password'
+INSERT_BATCH_SIZE = 10000
+
+def make_vocabulary(rng, size=VOCABULARY_SIZE):
+    letters = np.array(list('abcdefghijklmnopqrstuvwxyz'))
+    lengths = rng.integers(3, 10, size)
+    return [''.join(rng.choice(letters, n)) for n in lengths]
+
+def zipf_choice(rng, n_items, size, exponent=1.1):
+    # Popularity follows a power law, like real catalogues: a few titles get most ratings.
+    weights = 1.0 / np.arange(1, n_items + 1) ** exponent
+    return rng.choice(n_items, size=size, p=weights / weights.sum())
+
+def generate_movies(rng, n_movies, n_genres=20, n_platforms=8):
+    vocabulary = np.array(make_vocabulary(rng))
+    word_ids = zipf_choice(rng, len(vocabulary), n_movies * WORDS_PER_DESCRIPTION).reshape(n_movies, WORDS_PER_DESCRIPTION)
+    movies = {
+        'Movie_id': np.arange(1, n_movies + 1),
+        'Name': np.array([f"{vocabulary[a].title()} {vocabulary[b]} {i}" for i, (a, b) in enumerate(rng.integers(0, 2000, (n_movies, 2)), 1)], dtype=object),
+        'Release_year': rng.integers(1950, 2025, n_movies),
+        'Duration': rng.integers(70, 200, n_movies),
+        'Description': np.array([' '.join(vocabulary[row]) for row in word_ids], dtype=object),
+        'Poster_URL': np.full(n_movies, '', dtype=object),
+        'Genre_id': rng.integers(1, n_genres + 1, n_movies),
+        'Platform_id': rng.integers(1, n_platforms + 1, n_movies),
+    }
+    genres = {'Genre_id': np.arange(1, n_genres + 1), 'Title': np.array([f"Genre {i}" for i in range(1, n_genres + 1)], dtype=object)}
+    platforms = {'Platform_id': np.arange(1, n_platforms + 1), 'Platformname': np.array([f"Platform {i}" for i in range(1, n_platforms + 1)], dtype=object)}
+    return genres, platforms, movies
+
+def generate_users(n_users):
+    # Every synthetic user shares one password so the load driver can log in as any of them.
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+    return {
+        'User_id': np.arange(1, n_users + 1),
+        'Name': np.array([f"Bench User {i}" for i in range(1, n_users + 1)], dtype=object),
+        'Email': np.array([f"bench{i}@example.com" for i in range(1, n_users + 1)], dtype=object),
+        'Password': np.full(n_users, password_hash, dtype=object),
+        'is_admin': np.zeros(n_users, dtype=np.int64),
+    }
+
+def generate_pairs(rng, n_users, n_movies, n_pairs):
+    users = rng.integers(1, n_users + 1, n_pairs)
+    movies = zipf_choice(rng, n_movies, n_pairs) + 1
+    keys = np.unique(users.astype(np.int64) * (n_movies + 1) + movies)
+    return keys // (n_movies + 1), keys % (n_movies + 1)
+
+def generate_dataset(scale, seed=42):
+    rng = np.random.default_rng(seed)
+    genres, platforms, movies = generate_movies(rng, scale['movies'])
+    users = generate_users(scale['users'])
+    rating_users, rating_movies = generate_pairs(rng, scale['users'], scale['movies'], scale['ratings'])
+    ratings = {'User_id': rating_users, 'Movie_id': rating_movies,
+               'Rating_value': np.clip(np.round(rng.normal(3.6, 1.0, len(rating_users))), 1, 5).astype(np.int64)}
+    watch_users, watch_movies = generate_pairs(rng, scale['users'], scale['movies'], scale['ratings'] // 10)
+    watchlist = {'User_id': watch_users, 'Movie_id': watch_movies}
+    return {'genre': genres, 'platform': platforms, 'movie': movies, 'users': users, 'rating': ratings, 'watchlist': watchlist}
+
+def load_table(connection, table, columns, use_load_data=False):
+    names = list(columns.keys())
+    arrays = [columns[name] for name in names]
+    if use_load_data:
+        return load_data_infile(table, names, arrays)
+    sql = f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join(['%s'] * len(names))})"
+    with connection.cursor() as cursor:
+        for start in range(0, len(arrays[0]), INSERT_BATCH_SIZE):
+            cursor.executemany(sql, list(zip(*(a[start:start + INSERT_BATCH_SIZE].tolist() for a in arrays))))
+            connection.commit()
+
+def load_dataset(dataset, use_load_data=False):
+    connection = db_pool.get_pool(min_size=1, max_size=2).acquire()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+            for table in ('watchlist', 'rating', 'movie_similarity', 'movie', 'users', 'genre', 'platform'):
+                cursor.execute(f"TRUNCATE TABLE {table}")
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+        connection.commit()
+        for table in ('genre', 'platform', 'movie', 'users', 'rating', 'watchlist'):
+            print(f"Loading {len(next(iter(dataset[table].values())))} rows into {table}...")
+            load_table(connection, table, dataset[table], use_load_data)
+    finally:
+        connection.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic catalogue and load it into a local MySQL database.")
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--movies', type=int)
+    parser.add_argument('--users', type=int)
+    parser.add_argument('--ratings', type=int)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--db', default='movie_bench', help='database to load; it is truncated first, never point this at production')
+    parser.add_argument('--load-data', action='store_true', help='bulk load with LOAD DATA LOCAL INFILE')
+    args = parser.parse_args()
+
+    scale = dict(SCALES[args.scale])
+    for key in ('movies', 'users', 'ratings'):
+        if getattr(args, key): scale[key] = getattr(args, key)
+    db_pool.DB_CONFIG['db'] = args.db
+    dataset = generate_dataset(scale, args.seed)
+    load_dataset(dataset, args.load_data)
+    print(f"Loaded synthetic dataset {scale} into '{args.db}'. Log in as bench1@example.com / {BENCH_PASSWORD}.")
@@ -0,0 +1,102 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import time
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = 'static'
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+RETIRED_NAME = 'retired.json'
+KEEP_RETIRED_DAYS = 7
+COMPRESSIBLE = ('.css', '.js', '.html', '.svg', '.json', '.txt')
+
+def source_assets(static_dir):
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != os.path.join(static_dir, DIST_DIR)]
+        for name in files:
+            full = os.path.join(root, name)
+            yield os.path.relpath(full, static_dir).replace(os.sep, '/'), full
+
+def write_atomic(path, data):
+    # The server may be serving this directory, so never expose a partial file.
+    with open(path + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(path + '.tmp', path)
+
+def write_compressed(path, data):
+    # Fills in whichever siblings are missing (e.g. brotli was installed after
+    # an earlier build), and only keeps one when it is actually smaller.
+    if not os.path.exists(path + '.gz'):
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(compressed) < len(data): write_atomic(path + '.gz', compressed)
+    if brotli is not None and not os.path.exists(path + '.br'):
+        compressed = brotli.compress(data, quality=11)
+        if len(compressed) < len(data): write_atomic(path + '.br', compressed)
+
+def prune_retired(static_dir, manifest, keep_days=KEEP_RETIRED_DAYS):
+    # Running servers, browser caches and CDN copies of older pages still
+    # point at earlier fingerprints, so a file that drops out of the manifest
+    # is kept for keep_days after the build that retired it.
+    dist_dir = os.path.join(static_dir, DIST_DIR)
+    retired_path = os.path.join(dist_dir, RETIRED_NAME)
+    try:
+        with open(retired_path) as f:
+            retired = json.load(f)
+    except (OSError, ValueError):
+        retired = {}
+    live, now, removed = set(manifest.values()), time.time(), 0
+    still_retired = {}
+    for root, dirs, files in os.walk(dist_dir):
+        for name in files:
+            path = os.path.relpath(os.path.join(root, name), static_dir).replace(os.sep, '/')
+            base = path[:-3] if path.endswith(('.gz', '.br')) else path
+            if (root == dist_dir and name in (MANIFEST_NAME, RETIRED_NAME)) or base in live: continue
+            retired_at = retired.get(base, now)
+            if now - retired_at > keep_days * 86400:
+                os.remove(os.path.join(root, name))
+                removed += 1
+            else:
+                still_retired[base] = retired_at
+    with open(retired_path + '.tmp', 'w') as f:
+        json.dump(still_retired, f, indent=2, sort_keys=True)
+    os.replace(retired_path + '.tmp', retired_path)
+    return removed
+
+def build_assets(static_dir=STATIC_DIR, keep_days=KEEP_RETIRED_DAYS):
+    # Fingerprinted names are content hashes, so files from earlier builds are
+    # left in place; only prune_retired deletes them.
+    dist_dir = os.path.join(static_dir, DIST_DIR)
+    os.makedirs(dist_dir, exist_ok=True)
+    manifest = {}
+    for name, full in source_assets(static_dir):
+        with open(full, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        stem, ext = os.path.splitext(name)
+        fingerprinted = f"{DIST_DIR}/{stem}.{digest}{ext}"
+        target = os.path.join(static_dir, fingerprinted)
+        manifest[name] = fingerprinted
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            write_atomic(target, data)
+        if ext.lower() in COMPRESSIBLE: write_compressed(target, data)
+    tmp_path = os.path.join(dist_dir, MANIFEST_NAME + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, os.path.join(dist_dir, MANIFEST_NAME))
+    prune_retired(static_dir, manifest, keep_days)
+    return manifest
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--static-dir', default=STATIC_DIR)
+    parser.add_argument('--keep-days', type=float, default=KEEP_RETIRED_DAYS, help='keep fingerprinted files from earlier builds this long')
+    args = parser.parse_args()
+    manifest = build_assets(args.static_dir, args.keep_days)
+    print(f"Built {len(manifest)} fingerprinted assets into {os.path.join(args.static_dir, DIST_DIR)}")
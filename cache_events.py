@@ -0,0 +1,128 @@
+import random
+import threading
+import time
+from db_pool import get_pool
+
+POLL_INTERVAL = 1.0
+POLL_BATCH = 1000
+GAP_GRACE = 10.0
+RETENTION = 3600
+PRUNE_INTERVAL = 60.0
+CREATE_TABLE_SQL = """CREATE TABLE IF NOT EXISTS cache_events (
+    Event_id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    Origin INT NOT NULL,
+    Kind VARCHAR(16) NOT NULL,
+    User_id INT NULL,
+    Movie_id INT NULL,
+    Value INT NULL,
+    Created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    KEY cache_events_created (Created_at)
+)"""
+INSERT_SQL = "INSERT INTO cache_events (Origin, Kind, User_id, Movie_id, Value) VALUES (%s, %s, %s, %s, %s)"
+
+# Identifies the publishing process so its listener can skip events it has
+# already applied locally. Zero (before start(), e.g. the replay in the
+# prefork parent) is never skipped by anyone.
+origin = 0
+# Set by server.run_prefork: with a single process there is nobody to tell,
+# so publishing is a no-op and no listener polls.
+enabled = False
+
+
+def publish(cursor, kind, user_id=None, movie_id=None, value=None):
+    # Call inside the transaction that makes the change, so other workers see
+    # the event exactly when they can see the data.
+    if not enabled: return
+    cursor.execute(INSERT_SQL, (origin, kind, user_id, movie_id, value))
+
+def publish_many(cursor, kind, rows):
+    # rows: [(user_id, movie_id, value)]
+    if not enabled: return
+    cursor.executemany(INSERT_SQL, [(origin, kind, user_id, movie_id, value) for user_id, movie_id, value in rows])
+
+
+class CacheEventListener:
+    # Every prefork worker holds its own caches and models, so a change made
+    # through one worker is published to the cache_events table and the other
+    # workers tail it, calling handlers[kind](event) for each row.
+    def __init__(self, handlers, interval=POLL_INTERVAL, retention=RETENTION):
+        self.handlers = handlers
+        self.interval = interval
+        self.retention = retention
+        self.floor = 0
+        self._seen = set()
+        self._gaps = {}
+        self._last_prune = 0.0
+        self.counters = {'polls': 0, 'applied': 0, 'skipped_own': 0, 'errors': 0, 'gaps_skipped': 0}
+
+    def start(self, connection):
+        # Call before loading any cache from MySQL: anything committed after
+        # the high-water mark read here is either in that load or in an event.
+        global origin
+        origin = random.randint(1, 2 ** 31 - 1)
+        with connection.cursor() as cursor:
+            cursor.execute(CREATE_TABLE_SQL)
+            cursor.execute("SELECT COALESCE(MAX(Event_id), 0) AS last_id FROM cache_events")
+            self.floor = int(cursor.fetchone()['last_id'])
+        connection.commit()
+        threading.Thread(target=self._loop, name="cache-events", daemon=True).start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.poll()
+            except Exception as e:
+                self.counters['errors'] += 1
+                print(f"Polling cache events failed, will retry: {e}")
+
+    def poll(self):
+        connection = get_pool().acquire()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT Event_id, Origin, Kind, User_id, Movie_id, Value FROM cache_events WHERE Event_id > %s ORDER BY Event_id LIMIT %s",
+                               (self.floor, POLL_BATCH))
+                events = cursor.fetchall()
+                now = time.monotonic()
+                if now - self._last_prune > PRUNE_INTERVAL:
+                    self._last_prune = now
+                    cursor.execute("DELETE FROM cache_events WHERE Created_at < NOW() - INTERVAL %s SECOND", (self.retention,))
+            connection.commit()
+        finally:
+            connection.close()
+        self.counters['polls'] += 1
+        for event in events:
+            if event['Event_id'] in self._seen: continue
+            self._seen.add(event['Event_id'])
+            if event['Origin'] == origin:
+                self.counters['skipped_own'] += 1
+                continue
+            handler = self.handlers.get(event['Kind'])
+            if handler is None: continue
+            try:
+                handler(event)
+                self.counters['applied'] += 1
+            except Exception as e:
+                self.counters['errors'] += 1
+                print(f"Applying cache event {event['Event_id']} ({event['Kind']}) failed: {e}")
+        self._advance(time.monotonic())
+        return len(events)
+
+    def _advance(self, now):
+        # Ids are allocated at insert but become visible at commit, so a lower
+        # id can still appear after a higher one; the floor only moves past a
+        # missing id once it has stayed missing for GAP_GRACE (a rollback).
+        while self._seen:
+            next_id = self.floor + 1
+            if next_id in self._seen:
+                self._seen.discard(next_id)
+                self._gaps.pop(next_id, None)
+            elif now - self._gaps.setdefault(next_id, now) >= GAP_GRACE:
+                del self._gaps[next_id]
+                self.counters['gaps_skipped'] += 1
+            else:
+                break
+            self.floor = next_id
+
+    def stats(self):
+        return dict(self.counters, floor=self.floor, unconfirmed_gaps=len(self._gaps))
@@ -0,0 +1,67 @@
+import threading
+
+MOVIE_CARD_SQL = "SELECT m.*, g.Title AS Genre, p.Platformname AS Platform FROM movie m LEFT JOIN genre g ON m.Genre_id = g.Genre_id LEFT JOIN platform p ON m.Platform_id = p.Platform_id"
+
+
+class CatalogueCache:
+    # Read-through cache of denormalised movie cards (movie + genre title +
+    # platform name) and the genre/platform lists. Callers pass the cursor
+    # they already hold; it is only used on a miss.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._movies = {}
+        self._genres = None
+        self._platforms = None
+        self.counters = {'hits': 0, 'misses': 0}
+
+    def load(self, cursor):
+        cursor.execute(MOVIE_CARD_SQL)
+        movies = {movie['Movie_id']: movie for movie in cursor.fetchall()}
+        cursor.execute("SELECT * FROM genre ORDER BY Title")
+        genres = cursor.fetchall()
+        cursor.execute("SELECT * FROM platform ORDER BY Platformname")
+        platforms = cursor.fetchall()
+        with self._lock:
+            self._movies, self._genres, self._platforms = movies, genres, platforms
+
+    def get_movies(self, movie_ids, cursor):
+        # Returns cards in the order of movie_ids, skipping ids that no longer exist.
+        with self._lock:
+            found = {movie_id: self._movies[movie_id] for movie_id in movie_ids if movie_id in self._movies}
+        missing = [movie_id for movie_id in dict.fromkeys(movie_ids) if movie_id not in found]
+        self.counters['hits'] += len(found)
+        self.counters['misses'] += len(missing)
+        if missing:
+            placeholders = ', '.join(['%s'] * len(missing))
+            cursor.execute(f"{MOVIE_CARD_SQL} WHERE m.Movie_id IN ({placeholders})", tuple(missing))
+            fetched = {movie['Movie_id']: movie for movie in cursor.fetchall()}
+            with self._lock: self._movies.update(fetched)
+            found.update(fetched)
+        return [found[movie_id] for movie_id in movie_ids if movie_id in found]
+
+    def get_movie(self, movie_id, cursor):
+        movies = self.get_movies([movie_id], cursor)
+        return movies[0] if movies else None
+
+    def genres(self, cursor):
+        if self._genres is None:
+            cursor.execute("SELECT * FROM genre ORDER BY Title")
+            self._genres = cursor.fetchall()
+        return self._genres
+
+    def platforms(self, cursor):
+        if self._platforms is None:
+            cursor.execute("SELECT * FROM platform ORDER BY Platformname")
+            self._platforms = cursor.fetchall()
+        return self._platforms
+
+    def invalidate_movie(self, movie_id):
+        with self._lock: self._movies.pop(int(movie_id), None)
+
+    def invalidate(self):
+        with self._lock:
+            self._movies, self._genres, self._platforms = {}, None, None
+
+    def stats(self):
+        with self._lock: result = dict(self.counters, movies=len(self._movies))
+        return result
@@ -0,0 +1,195 @@
+import threading
+import numpy as np
+import scipy.sparse as sp
+
+MERGE_BATCH = 1000
+
+
+def build_matrix(rows, cols, values, shape):
+    # Duplicate (user, movie) pairs should not exist, but keep the last one rather than summing.
+    if not len(values): return sp.csr_matrix(shape, dtype=np.float64)
+    keys = rows.astype(np.int64) * shape[1] + cols
+    _, last = np.unique(keys[::-1], return_index=True)
+    keep = len(keys) - 1 - last
+    matrix = sp.csr_matrix((values[keep], (rows[keep], cols[keep])), shape=shape)
+    matrix.sort_indices()
+    return matrix
+
+def row_entries(matrix, delta, row):
+    start, end = matrix.indptr[row], matrix.indptr[row + 1]
+    cols, data = matrix.indices[start:end], matrix.data[start:end]
+    if delta is not None:
+        start, end = delta.indptr[row], delta.indptr[row + 1]
+        cols, data = np.concatenate([cols, delta.indices[start:end]]), np.concatenate([data, delta.data[start:end]])
+    return cols, data
+
+
+class CollaborativeModel:
+    # User-user collaborative filtering over a sparse CSR user x movie rating
+    # matrix kept in memory between requests. Row norms are cached so a query
+    # only scores the target user's row against everyone else. New (user, movie)
+    # pairs wait in a small delta that queries overlay on the stored matrix and
+    # are folded in with one vectorized rebuild every merge_batch pairs.
+    def __init__(self, neighbours=3, min_similarity=0.2, min_rating=3, merge_batch=MERGE_BATCH):
+        self.neighbours = neighbours
+        self.min_similarity = min_similarity
+        self.min_rating = min_rating
+        self.merge_batch = merge_batch
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self._generation = 0
+        self._backlog = None
+        self.loaded = False
+        self._reset()
+
+    def _reset(self):
+        self.user_index, self.movie_index = {}, {}
+        self.user_ids, self.movie_ids = [], []
+        self.matrix = sp.csr_matrix((0, 0), dtype=np.float64)
+        self.row_norms = np.zeros(0)
+        self._pending = {}
+
+    def load(self, connection):
+        # The table scan and matrix build run outside _lock, so queries and
+        # update_rating are not held up by them; ratings that arrive meanwhile
+        # are replayed on top before the new matrix goes live.
+        with self._lock:
+            generation = self._generation
+            self._backlog = []
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT User_id, Movie_id, Rating_value FROM rating")
+                rows = cursor.fetchall()
+            users = np.fromiter((row['User_id'] for row in rows), dtype=np.int64, count=len(rows))
+            movies = np.fromiter((row['Movie_id'] for row in rows), dtype=np.int64, count=len(rows))
+            values = np.fromiter((row['Rating_value'] for row in rows), dtype=np.float64, count=len(rows))
+            user_ids, rows_idx = np.unique(users, return_inverse=True)
+            movie_ids, cols_idx = np.unique(movies, return_inverse=True)
+            matrix = build_matrix(rows_idx, cols_idx, values, (len(user_ids), len(movie_ids)))
+            user_ids, movie_ids = user_ids.tolist(), movie_ids.tolist()
+        except BaseException:
+            with self._lock: self._backlog = None
+            raise
+        with self._lock:
+            backlog, self._backlog = self._backlog, None
+            # Invalidated mid-load (e.g. a movie was deleted): drop this snapshot, the next query reloads.
+            if generation != self._generation: return
+            self.user_ids, self.movie_ids = user_ids, movie_ids
+            self.user_index = {user_id: row for row, user_id in enumerate(user_ids)}
+            self.movie_index = {movie_id: col for col, movie_id in enumerate(movie_ids)}
+            self._set_matrix(matrix)
+            self._pending = {}
+            self.loaded = True
+            for user_id, movie_id, rating_value in backlog:
+                self.update_rating(user_id, movie_id, rating_value)
+
+    def invalidate(self):
+        with self._lock:
+            self.loaded = False
+            self._generation += 1
+            self._reset()
+
+    def ensure_loaded(self, connection):
+        if self.loaded: return
+        with self._load_lock:
+            if not self.loaded: self.load(connection)
+
+    def _row_for(self, user_id):
+        row = self.user_index.get(user_id)
+        if row is None:
+            row = self.user_index[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+        return row
+
+    def _col_for(self, movie_id):
+        col = self.movie_index.get(movie_id)
+        if col is None:
+            col = self.movie_index[movie_id] = len(self.movie_ids)
+            self.movie_ids.append(movie_id)
+        return col
+
+    def _set_matrix(self, matrix):
+        self.matrix = matrix
+        self.row_norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+
+    def _merge_pending(self):
+        if not self._pending: return
+        coo = self.matrix.tocoo()
+        keys = np.array(list(self._pending.keys()), dtype=np.int64)
+        values = np.fromiter(self._pending.values(), dtype=np.float64, count=len(self._pending))
+        self._set_matrix(build_matrix(np.concatenate([coo.row, keys[:, 0]]), np.concatenate([coo.col, keys[:, 1]]),
+                                      np.concatenate([coo.data, values]), (len(self.user_ids), len(self.movie_ids))))
+        self._pending = {}
+
+    def _overlay(self):
+        # Returns the stored matrix padded to the current index size, the
+        # pending delta (None when empty) and the row norms of their sum.
+        # Pending pairs never overlap stored ones, so squared norms just add.
+        shape = (len(self.user_ids), len(self.movie_ids))
+        matrix, norms = self.matrix, self.row_norms
+        if matrix.shape != shape:
+            extra = shape[0] - matrix.shape[0]
+            indptr = np.concatenate([matrix.indptr, np.full(extra, matrix.indptr[-1], dtype=matrix.indptr.dtype)])
+            matrix = sp.csr_matrix((matrix.data, matrix.indices, indptr), shape=shape)
+            norms = np.concatenate([norms, np.zeros(extra)])
+        if not self._pending: return matrix, None, norms
+        keys = np.array(list(self._pending.keys()), dtype=np.int64)
+        values = np.fromiter(self._pending.values(), dtype=np.float64, count=len(self._pending))
+        delta = sp.csr_matrix((values, (keys[:, 0], keys[:, 1])), shape=shape)
+        norms = np.sqrt(norms ** 2 + np.asarray(delta.multiply(delta).sum(axis=1)).ravel())
+        return matrix, delta, norms
+
+    def update_rating(self, user_id, movie_id, rating_value):
+        with self._lock:
+            if not self.loaded:
+                if self._backlog is not None: self._backlog.append((user_id, movie_id, rating_value))
+                return
+            row, col = self._row_for(user_id), self._col_for(movie_id)
+            if row < self.matrix.shape[0] and col < self.matrix.shape[1]:
+                start, end = self.matrix.indptr[row], self.matrix.indptr[row + 1]
+                pos = start + np.searchsorted(self.matrix.indices[start:end], col)
+                if pos < end and self.matrix.indices[pos] == col:
+                    # Existing rating: overwrite the stored value and refresh just this row's norm.
+                    self.matrix.data[pos] = rating_value
+                    row_data = self.matrix.data[start:end]
+                    self.row_norms[row] = np.sqrt(np.dot(row_data, row_data))
+                    return
+            # New (user, movie) pair: changing the sparsity pattern is O(nnz), so batch it.
+            self._pending[(row, col)] = float(rating_value)
+            if len(self._pending) >= self.merge_batch: self._merge_pending()
+
+    def recommend(self, user_id, top_n=10, with_scores=False):
+        with self._lock:
+            if not self.loaded: return []
+            row = self.user_index.get(user_id)
+            if row is None: return []
+            matrix, delta, norms = self._overlay()
+            if norms[row] == 0: return []
+            target = matrix.getrow(row) if delta is None else matrix.getrow(row) + delta.getrow(row)
+            dots = np.asarray(matrix.dot(target.T).todense()).ravel()
+            if delta is not None: dots += np.asarray(delta.dot(target.T).todense()).ravel()
+            denom = norms * norms[row]
+            similarities = np.divide(dots, denom, out=np.zeros_like(dots), where=denom > 0)
+            similarities[row] = -np.inf
+            if len(similarities) < 2: return []
+
+            k = min(self.neighbours, len(similarities) - 1)
+            top = np.argpartition(-similarities, k - 1)[:k]
+            top = top[np.argsort(-similarities[top], kind='stable')]
+
+            score_sum, score_count = {}, {}
+            for neighbour in top:
+                similarity = similarities[neighbour]
+                if similarity < self.min_similarity: continue
+                cols, ratings = row_entries(matrix, delta, neighbour)
+                liked = ratings > self.min_rating
+                for col, rating in zip(cols[liked], ratings[liked]):
+                    score_sum[col] = score_sum.get(col, 0.0) + rating * similarity
+                    score_count[col] = score_count.get(col, 0) + 1
+
+            watched = set(row_entries(matrix, delta, row)[0].tolist())
+            scored = [(score_sum[col] / score_count[col], col) for col in score_sum if col not in watched]
+            scored.sort(key=lambda item: item[0], reverse=True)
+            if with_scores:
+                return [(int(self.movie_ids[col]), float(score)) for score, col in scored[:top_n]]
+            return [int(self.movie_ids[col]) for _, col in scored[:top_n]]
@@ -0,0 +1,41 @@
+import argparse
+import pymysql
+from db_pool import get_pool, DB_CONFIG
+
+# (table, index name, columns): secondary indexes the server's queries rely on.
+# movie_release_year_id serves /browse's keyset pages: each page is a range
+# scan on (Release_year, Movie_id) instead of a full scan plus filesort.
+INDEXES = (
+    ('movie', 'movie_release_year_id', ('Release_year', 'Movie_id')),
+)
+
+def connect_db():
+    return get_pool(min_size=1, max_size=2).acquire()
+
+def missing_indexes(cursor):
+    missing = []
+    for table, name, columns in INDEXES:
+        cursor.execute("SELECT 1 FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s LIMIT 1", (table, name))
+        if cursor.fetchone() is None: missing.append((table, name, columns))
+    return missing
+
+def create_indexes():
+    connection = connect_db()
+    try:
+        with connection.cursor() as cursor:
+            for table, name, columns in missing_indexes(cursor):
+                print(f"Creating index {name} on {table} ({', '.join(columns)})...")
+                try:
+                    cursor.execute(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})")
+                except pymysql.MySQLError as e:
+                    print(f"Error creating index {name}: {e}")
+        connection.commit()
+    finally:
+        connection.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the secondary indexes the server's queries rely on; safe to re-run.")
+    parser.add_argument('--db', default=DB_CONFIG['db'])
+    args = parser.parse_args()
+    DB_CONFIG['db'] = args.db
+    create_indexes()
@@ -0,0 +1,215 @@
+import threading
+import time
+from collections import deque
+import pymysql
+import metrics
+
+
+DB_CONFIG = {
+    'host': 'localhost', 'user': 'root', 'password': '', 'db': 'movie',
+    'charset': 'utf8mb4', 'cursorclass': pymysql.cursors.DictCursor
+}
+POOL_MIN_SIZE = 2
+POOL_MAX_SIZE = 20
+POOL_CHECKOUT_TIMEOUT = 5.0
+POOL_IDLE_TIMEOUT = 300.0
+POOL_HEALTH_CHECK_AFTER = 30.0
+POOL_REAP_INTERVAL = 60.0
+
+
+class PoolTimeout(pymysql.MySQLError):
+    pass
+
+
+class PooledConnection:
+    # Behaves like a pymysql connection; close() hands it back to the pool
+    # instead of tearing down the TCP session, so handlers keep their
+    # existing try/finally: connection.close() pattern.
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self.checked_out = False
+        self.last_used = time.monotonic()
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args):
+        return metrics.registry.wrap_cursor(self._raw.cursor(*args))
+
+    def close(self):
+        if self._raw is not None and self.checked_out:
+            self._pool.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    def __init__(self, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE, checkout_timeout=POOL_CHECKOUT_TIMEOUT,
+                 idle_timeout=POOL_IDLE_TIMEOUT, health_check_after=POOL_HEALTH_CHECK_AFTER, **connect_kwargs):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.connect_kwargs = dict(DB_CONFIG, **connect_kwargs)
+        self._idle = deque()
+        self._size = 0
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self.stats_counters = {'created': 0, 'closed': 0, 'checkouts': 0, 'waits': 0, 'timeouts': 0,
+                               'failed_health_checks': 0, 'wait_time_total': 0.0, 'wait_time_max': 0.0}
+        for _ in range(min_size):
+            try:
+                conn = self._open()
+            except pymysql.MySQLError as e:
+                print(f"Error pre-filling MySQL connection pool: {e}")
+                break
+            self._idle.append(conn)
+            self._size += 1
+        self._reaper = threading.Thread(target=self._reap_loop, name="db-pool-reaper", daemon=True)
+        self._reaper.start()
+
+    def _open(self):
+        raw = pymysql.connect(**self.connect_kwargs)
+        with self._cond: self.stats_counters['created'] += 1
+        return PooledConnection(self, raw)
+
+    def _discard(self, conn):
+        raw, conn._raw = conn._raw, None
+        try:
+            if raw is not None: raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self.stats_counters['closed'] += 1
+            self._cond.notify()
+
+    def _healthy(self, conn):
+        if time.monotonic() - conn.last_used < self.health_check_after:
+            return True
+        try:
+            conn._raw.ping(reconnect=False)
+            return True
+        except Exception:
+            self.stats_counters['failed_health_checks'] += 1
+            return False
+
+    def acquire(self):
+        started = time.monotonic()
+        deadline = started + self.checkout_timeout
+        waited = False
+        while True:
+            conn, create = None, False
+            with self._cond:
+                if self._closed: raise pymysql.MySQLError("Connection pool is closed")
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats_counters['timeouts'] += 1
+                        raise PoolTimeout(f"Timed out after {self.checkout_timeout}s waiting for a DB connection")
+                    waited = True
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn = self._idle.pop()
+                else:
+                    self._size += 1
+                    create = True
+            if create:
+                try:
+                    conn = self._open()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._healthy(conn):
+                self._discard(conn)
+                continue
+            conn.checked_out = True
+            wait_time = time.monotonic() - started
+            with self._cond:
+                self._in_use += 1
+                self.stats_counters['checkouts'] += 1
+                if waited: self.stats_counters['waits'] += 1
+                self.stats_counters['wait_time_total'] += wait_time
+                self.stats_counters['wait_time_max'] = max(self.stats_counters['wait_time_max'], wait_time)
+            return conn
+
+    def release(self, conn):
+        conn.checked_out = False
+        with self._cond: self._in_use -= 1
+        try:
+            # End any open transaction so the next borrower does not read an old snapshot.
+            conn._raw.rollback()
+        except Exception:
+            return self._discard(conn)
+        conn.last_used = time.monotonic()
+        with self._cond:
+            if self._closed:
+                close_it = True
+            else:
+                close_it = False
+                self._idle.append(conn)
+                self._cond.notify()
+        if close_it: self._discard(conn)
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(POOL_REAP_INTERVAL)
+            if self._closed: return
+            self.reap_idle()
+
+    def reap_idle(self):
+        now = time.monotonic()
+        expired = []
+        with self._cond:
+            # Oldest connections sit at the left end since acquire() pops from the right.
+            while self._idle and self._size - len(expired) > self.min_size and now - self._idle[0].last_used > self.idle_timeout:
+                expired.append(self._idle.popleft())
+        for conn in expired:
+            self._discard(conn)
+        return len(expired)
+
+    def stats(self):
+        with self._cond:
+            result = dict(self.stats_counters)
+            result.update({'size': self._size, 'in_use': self._in_use, 'idle': len(self._idle),
+                           'min_size': self.min_size, 'max_size': self.max_size})
+        checkouts = result['checkouts']
+        result['wait_time_avg'] = result['wait_time_total'] / checkouts if checkouts else 0.0
+        return result
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._cond.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(**kwargs):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(**kwargs)
+        return _pool
+
+def close_pool():
+    # Forked children must open their own sockets; sharing the parent's idle
+    # connections would interleave two processes on one protocol stream.
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None: pool.close()
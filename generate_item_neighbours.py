@@ -0,0 +1,65 @@
+import numpy as np
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+from db_pool import get_pool
+from generate_similarity import top_k_similar, shadow_load
+
+TOP_K = 50
+MIN_SCORE = 0.05
+BLOCK_SIZE = 256
+
+def connect_db():
+    return get_pool(min_size=1, max_size=2).acquire()
+
+def get_ratings():
+    connection = connect_db()
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT User_id, Movie_id, Rating_value FROM rating")
+        ratings = cursor.fetchall()
+    connection.close()
+    return ratings
+
+def build_item_matrix(ratings):
+    movie_ids = sorted({r['Movie_id'] for r in ratings})
+    user_ids = sorted({r['User_id'] for r in ratings})
+    movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+    user_index = {user_id: i for i, user_id in enumerate(user_ids)}
+    rows = np.fromiter((movie_index[r['Movie_id']] for r in ratings), dtype=np.int64, count=len(ratings))
+    cols = np.fromiter((user_index[r['User_id']] for r in ratings), dtype=np.int64, count=len(ratings))
+    values = np.fromiter((r['Rating_value'] for r in ratings), dtype=np.float64, count=len(ratings))
+    item_matrix = sp.csr_matrix((values, (rows, cols)), shape=(len(movie_ids), len(user_ids)))
+    return movie_ids, item_matrix
+
+def calculate_neighbours(movie_ids, item_matrix, top_k=TOP_K, min_score=MIN_SCORE, block_size=BLOCK_SIZE):
+    # Cosine over co-ratings: L2-normalise each movie's rating vector and reuse
+    # the blocked top-K selection from the description similarity job.
+    normalized = normalize(item_matrix, norm='l2', axis=1)
+    return top_k_similar(normalized, movie_ids, top_k, min_score, block_size)
+
+def save_neighbours(sources, targets, scores):
+    connection = connect_db()
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS movie_cf_neighbours (
+                movie_id INT NOT NULL,
+                neighbour_id INT NOT NULL,
+                similarity_score FLOAT NOT NULL,
+                PRIMARY KEY (movie_id, neighbour_id)
+            )
+        """)
+    connection.commit()
+    connection.close()
+    shadow_load('movie_cf_neighbours', ('movie_id', 'neighbour_id', 'similarity_score'), (sources, targets, scores))
+
+def generate_item_neighbours():
+    print("Extracting ratings...")
+    ratings = get_ratings()
+    print("Calculating item-item co-rating similarities...")
+    movie_ids, item_matrix = build_item_matrix(ratings)
+    sources, targets, scores = calculate_neighbours(movie_ids, item_matrix)
+    print(f"Saving {len(scores)} neighbour rows...")
+    save_neighbours(sources, targets, scores)
+    print("Item neighbour data generated and saved successfully.")
+
+if __name__ == "__main__":
+    generate_item_neighbours()
@@ -0,0 +1,114 @@
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from db_pool import get_pool
+from generate_user_recommendations import build_user_matrix
+from mf_model import MODEL_NAME, write_factors
+
+FACTORS = 64
+ITERATIONS = 10
+REGULARIZATION = 0.05
+BLOCK_SIZE = 2048
+WORKERS = os.cpu_count() or 1
+
+# Filled in the parent before each half-step's pool forks, as in
+# generate_user_recommendations.py, so workers read the matrices copy-on-write.
+_shared = {}
+
+def connect_db():
+    return get_pool(min_size=1, max_size=2).acquire()
+
+def get_ratings():
+    connection = connect_db()
+    with connection.cursor() as cursor:
+        # Read the high-water mark first: anything rated after it is folded in at serve time.
+        cursor.execute("SELECT COALESCE(MAX(Rating_id), 0) AS max_rating_id FROM rating")
+        max_rating_id = int(cursor.fetchone()['max_rating_id'])
+        cursor.execute("SELECT User_id, Movie_id, Rating_value FROM rating")
+        ratings = cursor.fetchall()
+    connection.close()
+    return ratings, max_rating_id
+
+def solve_block(bounds):
+    # Weighted-lambda ALS: each row solves (F'F + reg * n * I) x = F' r over
+    # the rows of the fixed side it has ratings for.
+    start, stop = bounds
+    matrix, fixed, regularization = _shared['matrix'], _shared['fixed'], _shared['regularization']
+    k = fixed.shape[1]
+    identity = np.eye(k)
+    solved = np.zeros((stop - start, k), dtype=np.float64)
+    for offset, row in enumerate(range(start, stop)):
+        begin, end = matrix.indptr[row], matrix.indptr[row + 1]
+        if begin == end: continue
+        factors = fixed[matrix.indices[begin:end]]
+        a = factors.T @ factors + regularization * (end - begin) * identity
+        solved[offset] = np.linalg.solve(a, factors.T @ matrix.data[begin:end])
+    return start, solved
+
+def solve_side(matrix, fixed, regularization, block_size=BLOCK_SIZE, workers=WORKERS):
+    _shared.update({'matrix': matrix, 'fixed': fixed, 'regularization': regularization})
+    blocks = [(start, min(start + block_size, matrix.shape[0])) for start in range(0, matrix.shape[0], block_size)]
+    result = np.zeros((matrix.shape[0], fixed.shape[1]), dtype=np.float64)
+    if workers > 1 and len(blocks) > 1:
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork')) as executor:
+            for start, solved in executor.map(solve_block, blocks):
+                result[start:start + len(solved)] = solved
+    else:
+        for bounds in blocks:
+            start, solved = solve_block(bounds)
+            result[start:start + len(solved)] = solved
+    return result
+
+def rmse(matrix, user_factors, item_factors, chunk_size=1000000):
+    coo = matrix.tocoo()
+    if not coo.nnz: return 0.0
+    squared_error = 0.0
+    for start in range(0, coo.nnz, chunk_size):
+        rows, cols = coo.row[start:start + chunk_size], coo.col[start:start + chunk_size]
+        predicted = np.einsum('ij,ij->i', user_factors[rows], item_factors[cols])
+        squared_error += float(np.sum((coo.data[start:start + chunk_size] - predicted) ** 2))
+    return float(np.sqrt(squared_error / coo.nnz))
+
+def train(matrix, factors=FACTORS, iterations=ITERATIONS, regularization=REGULARIZATION, block_size=BLOCK_SIZE, workers=WORKERS, seed=42):
+    # matrix holds mean-centred ratings; returns (user_factors, item_factors).
+    rng = np.random.default_rng(seed)
+    item_factors = rng.normal(0, 0.1, (matrix.shape[1], factors))
+    user_factors = np.zeros((matrix.shape[0], factors))
+    item_matrix = matrix.T.tocsr()
+    for iteration in range(iterations):
+        started = time.perf_counter()
+        user_factors = solve_side(matrix, item_factors, regularization, block_size, workers)
+        item_factors = solve_side(item_matrix, user_factors, regularization, block_size, workers)
+        print(f"Iteration {iteration + 1}/{iterations}: train RMSE {rmse(matrix, user_factors, item_factors):.4f} in {time.perf_counter() - started:.1f}s")
+    return user_factors, item_factors
+
+def generate_mf_model(factors=FACTORS, iterations=ITERATIONS, regularization=REGULARIZATION, block_size=BLOCK_SIZE, workers=WORKERS):
+    started = time.perf_counter()
+    print("Extracting ratings...")
+    ratings, max_rating_id = get_ratings()
+    if not ratings:
+        print("No ratings to train on.")
+        return
+    user_ids, movie_ids, matrix = build_user_matrix(ratings)
+    global_mean = float(matrix.data.mean())
+    matrix.data -= global_mean
+    print(f"Training {factors} factors on {matrix.nnz} ratings ({len(user_ids)} users x {len(movie_ids)} movies) across {workers} processes...")
+    user_factors, item_factors = train(matrix, factors, iterations, regularization, block_size, workers)
+    meta = {'factors': factors, 'iterations': iterations, 'regularization': regularization, 'global_mean': global_mean,
+            'max_rating_id': max_rating_id, 'trained_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'train_rmse': rmse(matrix, user_factors, item_factors)}
+    version = write_factors(user_ids, user_factors, movie_ids, item_factors, meta)
+    print(f"Published {MODEL_NAME} version {version} in {time.perf_counter() - started:.1f}s; send SIGHUP to the server to load it.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--factors', type=int, default=FACTORS)
+    parser.add_argument('--iterations', type=int, default=ITERATIONS)
+    parser.add_argument('--regularization', type=float, default=REGULARIZATION)
+    parser.add_argument('--block-size', type=int, default=BLOCK_SIZE, help='rows solved per task')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='processes solving blocks in parallel')
+    args = parser.parse_args()
+    generate_mf_model(args.factors, args.iterations, args.regularization, args.block_size, args.workers)
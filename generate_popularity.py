@@ -0,0 +1,25 @@
+import argparse
+import time
+from db_pool import get_pool
+from popularity import PRIOR_WEIGHT, rebuild
+
+def connect_db():
+    return get_pool(min_size=1, max_size=2).acquire()
+
+def generate_popularity(prior_weight=PRIOR_WEIGHT):
+    # handle_rating keeps movie_popularity current incrementally; this full
+    # pass only bootstraps the tables and corrects drift from deleted movies or users.
+    started = time.perf_counter()
+    print("Rebuilding movie_popularity from the rating table...")
+    connection = connect_db()
+    try:
+        rating_count, prior_mean = rebuild(connection, prior_weight)
+    finally:
+        connection.close()
+    print(f"Aggregated {rating_count} ratings (global mean {prior_mean:.3f}) in {time.perf_counter() - started:.1f}s.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--prior-weight', type=int, default=PRIOR_WEIGHT, help='ratings worth of global-mean prior in the Bayesian score')
+    args = parser.parse_args()
+    generate_popularity(args.prior_weight)
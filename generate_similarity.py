@@ -1,73 +1,425 @@
-import pymysql
+import argparse
+import fcntl
+import multiprocessing
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.feature_extraction.text import TfidfVectorizer
+import pymysql
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+from db_pool import get_pool, DB_CONFIG
+import similarity_index
+
+TOP_K = 50
+THRESHOLD = 0.05
+BLOCK_SIZE = 256
+INSERT_BATCH_SIZE = 5000
+CHUNK_SIZE = 2000
+WORKERS = os.cpu_count() or 1
+DESCRIPTION_FEATURES = 2 ** 20
+TITLE_FEATURES = 2 ** 18
+GENRE_FEATURES = 2 ** 10
+# Relative weight of the description, title and genre parts of a movie's vector.
+PART_WEIGHTS = (1.0, 0.35, 0.25)
+MOVIE_FEATURE_SQL = "SELECT m.Movie_id, m.Name, m.Description, g.Title AS Genre FROM movie m LEFT JOIN genre g ON m.Genre_id = g.Genre_id"
+MODEL_DIR = 'models'
+STATE_PATH = os.path.join(MODEL_DIR, 'similarity_state.pkl')
+STATE_LOCK_PATH = STATE_PATH + '.lock'
+
+_state = None
+_state_stamp = None
+_state_lock = threading.RLock()
+# Filled in the parent before the scoring pool forks, as in
+# generate_user_recommendations.py, so workers share the matrix copy-on-write.
+_shared = {}
 
 def connect_db():
-    return pymysql.connect(
-        host='localhost',
-        user='root',
-        password='',
-        db='movie',
-        charset='utf8mb4',
-        cursorclass=pymysql.cursors.DictCursor
-    )
+    return get_pool(min_size=1, max_size=2).acquire()
+
+@contextmanager
+def timed_stage(label):
+    print(f"{label}...")
+    started = time.perf_counter()
+    yield
+    print(f"{label} took {time.perf_counter() - started:.1f}s")
+
+def stream_movies(chunk_size=CHUNK_SIZE):
+    # Unbuffered server-side cursor: rows arrive chunk_size at a time instead
+    # of the whole catalogue being materialised by one fetchall().
+    connection = connect_db()
+    try:
+        with connection.cursor(pymysql.cursors.SSDictCursor) as cursor:
+            cursor.execute(MOVIE_FEATURE_SQL)
+            while True:
+                chunk = cursor.fetchmany(chunk_size)
+                if not chunk: break
+                yield chunk
+    finally:
+        connection.close()
 
 def get_movies():
+    return [movie for chunk in stream_movies() for movie in chunk]
+
+def genre_tokens(genre):
+    return [genre] if genre else []
+
+def count_features(movies):
+    # Stateless hashing, so any worker can tokenise any chunk without a shared
+    # vocabulary. Returns the ids and raw term counts for each feature part.
+    ids = np.array([movie['Movie_id'] for movie in movies], dtype=np.int64)
+    descriptions = HashingVectorizer(n_features=DESCRIPTION_FEATURES, alternate_sign=False, norm=None, dtype=np.float32)
+    titles = HashingVectorizer(n_features=TITLE_FEATURES, alternate_sign=False, norm=None, dtype=np.float32)
+    genres = HashingVectorizer(n_features=GENRE_FEATURES, analyzer=genre_tokens, alternate_sign=False, norm=None, dtype=np.float32)
+    return ids, (descriptions.transform([movie['Description'] or '' for movie in movies]),
+                 titles.transform([movie['Name'] or '' for movie in movies]),
+                 genres.transform([movie.get('Genre') for movie in movies]))
+
+def extract_features(chunks, workers=WORKERS):
+    ids, parts = [], ([], [], [])
+    def collect(result):
+        ids.append(result[0])
+        for collected, part in zip(parts, result[1]): collected.append(part)
+    if workers > 1:
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork')) as executor:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(executor.submit(count_features, chunk))
+                # Bounded read-ahead keeps memory flat while rows stream in.
+                if len(pending) >= 2 * workers: collect(pending.popleft().result())
+            while pending: collect(pending.popleft().result())
+    else:
+        for chunk in chunks: collect(count_features(chunk))
+    if not ids: return np.zeros(0, dtype=np.int64), None
+    return np.concatenate(ids), tuple(sp.vstack(part).tocsr() for part in parts)
+
+
+class MovieFeaturizer:
+    # Only the per-part IDF weights are fitted; tokenisation is hashing, so
+    # refresh_movie() transforms one movie exactly like the full rebuild did.
+    def __init__(self, idf, weights=PART_WEIGHTS):
+        self.idf = idf
+        self.weights = weights
+
+    def weigh(self, parts):
+        weighted = [normalize(part @ sp.diags(idf)) * weight for part, idf, weight in zip(parts, self.idf, self.weights)]
+        return normalize(sp.hstack(weighted).tocsr()).astype(np.float32)
+
+    def transform(self, movies):
+        return self.weigh(count_features(movies)[1])
+
+
+def fit_featurizer(parts):
+    # Smoothed IDF, as TfidfVectorizer computes it; CSR rows hold each hashed term once.
+    n = parts[0].shape[0]
+    idf = [np.log((1 + n) / (1 + np.bincount(part.indices, minlength=part.shape[1]))) + 1 for part in parts]
+    return MovieFeaturizer([weights.astype(np.float32) for weights in idf])
+
+def top_k_block(bounds):
+    start, stop = bounds
+    normalized, normalized_t, ids = _shared['normalized'], _shared['normalized_t'], _shared['ids']
+    k, threshold = _shared['k'], _shared['threshold']
+    block = (normalized[start:stop] @ normalized_t).toarray()
+    rows = np.arange(stop - start)
+    block[rows, rows + start] = -1
+    top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(block, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+    keep = top_scores > threshold
+    return np.broadcast_to(ids[start:stop, None], top.shape)[keep], ids[top[keep]], top_scores[keep].astype(np.float32)
+
+def top_k_similar(normalized, ids, top_k=TOP_K, threshold=THRESHOLD, block_size=BLOCK_SIZE, workers=1):
+    # Rows of `normalized` are unit length, so a block of rows times the
+    # transpose is a block of cosine similarities. Only block_size x N scores
+    # are ever dense at once; each row keeps its top_k neighbours above threshold.
+    ids = np.asarray(ids)
+    n = normalized.shape[0]
+    k = min(top_k, n - 1)
+    if k <= 0:
+        return ids[:0], ids[:0], np.zeros(0, dtype=np.float32)
+    _shared.update({'normalized': normalized, 'normalized_t': normalized.T.tocsr(), 'ids': ids, 'k': k, 'threshold': threshold})
+    blocks = [(start, min(start + block_size, n)) for start in range(0, n, block_size)]
+    if workers > 1 and len(blocks) > 1:
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork')) as executor:
+            results = list(executor.map(top_k_block, blocks, chunksize=max(1, len(blocks) // (workers * 4))))
+    else:
+        results = [top_k_block(bounds) for bounds in blocks]
+    _shared.clear()
+    sources, targets, scores = zip(*results)
+    return np.concatenate(sources), np.concatenate(targets), np.concatenate(scores)
+
+def fit_features(movies, workers=1):
+    movie_ids, parts = extract_features((movies[start:start + CHUNK_SIZE] for start in range(0, len(movies), CHUNK_SIZE)), workers)
+    featurizer = fit_featurizer(parts)
+    return movie_ids, featurizer, featurizer.weigh(parts)
+
+def calculate_similarity(movies, top_k=TOP_K, threshold=THRESHOLD, block_size=BLOCK_SIZE, workers=1):
+    movie_ids, _, matrix = fit_features(movies, workers)
+    return top_k_similar(matrix, movie_ids, top_k, threshold, block_size, workers)
+
+def symmetrize(sources, targets, scores):
+    # Lookups only filter on movie_id_1, so store every pair in both
+    # directions, keeping the higher score when both sides listed it.
+    all_sources = np.concatenate([sources, targets])
+    all_targets = np.concatenate([targets, sources])
+    all_scores = np.concatenate([scores, scores])
+    order = np.lexsort((-all_scores, all_targets, all_sources))
+    all_sources, all_targets, all_scores = all_sources[order], all_targets[order], all_scores[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = (all_sources[1:] != all_sources[:-1]) | (all_targets[1:] != all_targets[:-1])
+    return all_sources[first], all_targets[first], all_scores[first]
+
+def load_data_infile(table, columns, arrays):
+    # Fast path: one LOAD DATA LOCAL INFILE from a temporary TSV. Needs a
+    # dedicated connection with local_infile enabled on both ends.
+    fd, path = tempfile.mkstemp(suffix='.tsv')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            for row in zip(*(a.tolist() for a in arrays)):
+                f.write('\t'.join(str(v) for v in row) + '\n')
+        connection = pymysql.connect(**dict(DB_CONFIG, local_infile=True))
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} FIELDS TERMINATED BY '\\t' ({', '.join(columns)})", (path,))
+            connection.commit()
+        finally:
+            connection.close()
+    finally:
+        os.remove(path)
+
+def shadow_load(table, columns, arrays, batch_size=INSERT_BATCH_SIZE, use_load_data=False):
+    # Fill <table>_new in fixed-size batches while readers keep using <table>,
+    # then swap it in with one atomic RENAME. The previous generation is kept
+    # as <table>_old for rollback_table().
+    staging, previous = f"{table}_new", f"{table}_old"
     connection = connect_db()
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT Movie_id, Name, Description
-            FROM movie
-        """)
-        movies = cursor.fetchall()
-    connection.close()
-    return movies
-
-def calculate_similarity(movies):
-    movie_ids = [movie['Movie_id'] for movie in movies]
-    descriptions = [movie['Description'] if movie['Description'] else '' for movie in movies]
-    
-    tfidf = TfidfVectorizer()
-    tfidf_matrix = tfidf.fit_transform(descriptions)
-    similarity_matrix = cosine_similarity(tfidf_matrix)
-
-    return movie_ids, similarity_matrix
-
-def save_similarity(movie_ids, similarity_matrix):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+            cursor.execute(f"CREATE TABLE {staging} LIKE {table}")
+        connection.commit()
+
+        loaded = False
+        if use_load_data:
+            try:
+                load_data_infile(staging, columns, arrays)
+                loaded = True
+            except pymysql.MySQLError as e:
+                print(f"LOAD DATA LOCAL INFILE failed, falling back to batched inserts: {e}")
+                with connection.cursor() as cursor:
+                    cursor.execute(f"TRUNCATE TABLE {staging}")
+        if not loaded:
+            sql = f"INSERT INTO {staging} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+            total = len(arrays[0])
+            with connection.cursor() as cursor:
+                for start in range(0, total, batch_size):
+                    batch = list(zip(*(a[start:start + batch_size].tolist() for a in arrays)))
+                    cursor.executemany(sql, batch)
+                    connection.commit()
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {previous}")
+            cursor.execute(f"RENAME TABLE {table} TO {previous}, {staging} TO {table}")
+        connection.commit()
+    finally:
+        connection.close()
+
+def rollback_table(table):
+    previous, swap = f"{table}_old", f"{table}_swap"
     connection = connect_db()
-    with connection.cursor() as cursor:
-        
-        cursor.execute("TRUNCATE TABLE movie_similarity")
-        
-        
-        insert_queries = []
-        for i in range(len(movie_ids)):
-            for j in range(i + 1, len(movie_ids)):
-                movie_id_1 = movie_ids[i]
-                movie_id_2 = movie_ids[j]
-                similarity_score = similarity_matrix[i][j]
-
-                if similarity_score > 0.05:
-                    insert_queries.append((movie_id_1, movie_id_2, similarity_score))
-
-        if insert_queries:
-            cursor.executemany("""
-                INSERT INTO movie_similarity (movie_id_1, movie_id_2, similarity_score)
-                VALUES (%s, %s, %s)
-            """, insert_queries)
-        
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"RENAME TABLE {table} TO {swap}, {previous} TO {table}, {swap} TO {previous}")
         connection.commit()
-    connection.close()
+    finally:
+        connection.close()
+
+def save_similarity(sources, targets, scores, batch_size=INSERT_BATCH_SIZE, use_load_data=False):
+    sources, targets, scores = symmetrize(sources, targets, scores)
+    shadow_load('movie_similarity', ('movie_id_1', 'movie_id_2', 'similarity_score'),
+                (sources, targets, scores), batch_size, use_load_data)
+    return sources, targets, scores
+
+@contextmanager
+def state_file_lock():
+    # Read-modify-write of the pickle is serialised across prefork workers,
+    # the CLI and the scheduled rebuild; _state_lock covers threads in-process.
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    with _state_lock, open(STATE_LOCK_PATH, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try: yield
+        finally: fcntl.flock(f, fcntl.LOCK_UN)
+
+def state_stamp():
+    try: stat = os.stat(STATE_PATH)
+    except FileNotFoundError: return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+def load_state():
+    # Re-read whenever the file was replaced since this process last looked:
+    # a full rebuild or another worker may have written a newer state.
+    global _state, _state_stamp
+    stamp = state_stamp()
+    if stamp is None:
+        _state = _state_stamp = None
+    elif stamp != _state_stamp:
+        with open(STATE_PATH, 'rb') as f:
+            _state = pickle.load(f)
+        _state_stamp = stamp
+    return _state
 
-def generate_movie_similarity():
-    print("Extracting movie data...")
-    movies = get_movies()
-    print("Calculating similarities based on plot descriptions...")
-    movie_ids, similarity_matrix = calculate_similarity(movies)
-    print("Saving new similarity data...")
-    save_similarity(movie_ids, similarity_matrix)
-    print("Similarity data generated and saved successfully.")
+def save_state(state):
+    # Call with state_file_lock held. Writing back a state from an older
+    # generation than the one on disk would undo a rebuild's IDF refit.
+    global _state, _state_stamp
+    latest = load_state()
+    if latest is not None and latest is not state and latest.get('generation', 0) >= state.get('generation', 0):
+        print(f"Not saving similarity state generation {state.get('generation', 0)}; generation {latest.get('generation', 0)} is newer.")
+        return False
+    tmp_path = STATE_PATH + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, STATE_PATH)
+    _state, _state_stamp = state, state_stamp()
+    return True
+
+def generate_movie_similarity(top_k=TOP_K, threshold=THRESHOLD, block_size=BLOCK_SIZE,
+                              batch_size=INSERT_BATCH_SIZE, use_load_data=False, workers=WORKERS, chunk_size=CHUNK_SIZE):
+    started = time.perf_counter()
+    with timed_stage(f"Streaming and hashing movie features across {workers} processes"):
+        movie_ids, parts = extract_features(stream_movies(chunk_size), workers)
+    if parts is None:
+        print("No movies to score.")
+        return
+    with timed_stage(f"Weighting features for {len(movie_ids)} movies"):
+        featurizer = fit_featurizer(parts)
+        matrix = featurizer.weigh(parts)
+    with timed_stage("Scoring top-k neighbours"):
+        sources, targets, scores = top_k_similar(matrix, movie_ids, top_k, threshold, block_size, workers)
+    with timed_stage("Loading new similarity data into staging table"):
+        sources, targets, scores = save_similarity(sources, targets, scores, batch_size, use_load_data)
+    with timed_stage("Publishing memory-mapped similarity index"):
+        version = similarity_index.write_index(sources, targets, scores, top_k)
+    with state_file_lock():
+        previous = load_state()
+        save_state({'featurizer': featurizer, 'movie_ids': movie_ids.tolist(), 'matrix': matrix, 'top_k': top_k,
+                    'threshold': threshold, 'incremental_updates': 0, 'generation': (previous or {}).get('generation', 0) + 1})
+    print(f"Similarity data generated and swapped in successfully ({len(scores)} rows, index version {version}) in {time.perf_counter() - started:.1f}s.")
+
+def delete_movie_rows(cursor, movie_id):
+    cursor.execute("DELETE FROM movie_similarity WHERE movie_id_1 = %s OR movie_id_2 = %s", (movie_id, movie_id))
+
+def refresh_movie(movie_id):
+    # Incremental path for admin edits: transform one description with the
+    # stored vectorizer (IDF stays frozen until the next full rebuild), score
+    # it against the stored matrix and replace only that movie's rows.
+    with state_file_lock():
+        state = load_state()
+        if state is None or 'featurizer' not in state:
+            print("No similarity state from the current feature pipeline; run a full rebuild first.")
+            return 0
+        connection = connect_db()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"{MOVIE_FEATURE_SQL} WHERE m.Movie_id = %s", (movie_id,))
+                movie = cursor.fetchone()
+        finally:
+            connection.close()
+        # _remove_movie checks out its own connection, so this one is released first and only once.
+        if movie is None: return _remove_movie(movie_id)
+        connection = connect_db()
+        try:
+            vector = state['featurizer'].transform([movie])
+
+            movie_ids, matrix = state['movie_ids'], state['matrix']
+            if movie_id in movie_ids:
+                row = movie_ids.index(movie_id)
+                matrix = sp.vstack([matrix[:row], vector, matrix[row + 1:]]).tocsr()
+            else:
+                movie_ids.append(movie_id)
+                matrix = sp.vstack([matrix, vector]).tocsr()
+            state['matrix'] = matrix
+
+            scores = (matrix @ vector.T).toarray().ravel()
+            ids = np.asarray(movie_ids)
+            scores[ids == movie_id] = -1
+            k = min(state['top_k'], len(scores) - 1)
+            rows = []
+            if k > 0:
+                top = np.argpartition(-scores, k - 1)[:k]
+                top = top[scores[top] > state['threshold']]
+                for j in top.tolist():
+                    rows.append((movie_id, int(ids[j]), float(scores[j])))
+                    rows.append((int(ids[j]), movie_id, float(scores[j])))
+
+            with connection.cursor() as cursor:
+                delete_movie_rows(cursor, movie_id)
+                if rows:
+                    cursor.executemany("""
+                        INSERT INTO movie_similarity (movie_id_1, movie_id_2, similarity_score)
+                        VALUES (%s, %s, %s)
+                    """, rows)
+            connection.commit()
+        finally:
+            connection.close()
+        state['incremental_updates'] += 1
+        save_state(state)
+        return len(rows)
+
+def remove_movie(movie_id):
+    with state_file_lock():
+        return _remove_movie(movie_id)
+
+def _remove_movie(movie_id):
+    # Call with state_file_lock held; flock is per open file, so it must not be taken twice.
+    state = load_state()
+    connection = connect_db()
+    try:
+        with connection.cursor() as cursor:
+            delete_movie_rows(cursor, movie_id)
+        connection.commit()
+    finally:
+        connection.close()
+    if state is not None and movie_id in state['movie_ids']:
+        row = state['movie_ids'].index(movie_id)
+        keep = np.ones(len(state['movie_ids']), dtype=bool)
+        keep[row] = False
+        state['matrix'] = state['matrix'][keep]
+        del state['movie_ids'][row]
+        state['incremental_updates'] += 1
+        save_state(state)
+    return 0
 
 if __name__ == "__main__":
-    generate_movie_similarity()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--top-k', type=int, default=TOP_K, help='neighbours kept per movie')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='minimum similarity score stored')
+    parser.add_argument('--block-size', type=int, default=BLOCK_SIZE, help='movies scored per block; bounds peak memory')
+    parser.add_argument('--batch-size', type=int, default=INSERT_BATCH_SIZE, help='rows per INSERT batch into the staging table')
+    parser.add_argument('--load-data', action='store_true', help='bulk load with LOAD DATA LOCAL INFILE')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='processes hashing chunks and scoring blocks in parallel')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='movies streamed from MySQL per chunk')
+    parser.add_argument('--rollback', action='store_true', help='swap the previous movie_similarity generation back in')
+    parser.add_argument('--movie-id', type=int, help='incrementally refresh one movie instead of a full rebuild')
+    parser.add_argument('--delete', action='store_true', help='with --movie-id, drop that movie\'s similarity rows')
+    args = parser.parse_args()
+    # The full rebuild (no --movie-id) is meant to run on a schedule, e.g. nightly
+    # from cron, to refit IDF weights that drift as incremental updates accumulate.
+    if args.rollback:
+        rollback_table('movie_similarity')
+        print("Previous similarity generation restored.")
+    elif args.movie_id is not None:
+        if args.delete:
+            remove_movie(args.movie_id)
+        else:
+            print(f"Stored {refresh_movie(args.movie_id)} similarity rows for movie {args.movie_id}.")
+    else:
+        generate_movie_similarity(args.top_k, args.threshold, args.block_size, args.batch_size, args.load_data, args.workers, args.chunk_size)
\ No newline at end of file
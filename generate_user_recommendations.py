@@ -0,0 +1,144 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+from db_pool import get_pool
+from generate_similarity import shadow_load
+from hybrid import CANDIDATES
+
+# Long enough for the hybrid ranker's candidate pool, not just the page of 10.
+TOP_N = max(10, CANDIDATES)
+NEIGHBOURS = 3
+MIN_SIMILARITY = 0.2
+MIN_RATING = 3
+BLOCK_SIZE = 128
+WORKERS = os.cpu_count() or 1
+
+# Filled in the parent before the pool forks, so workers share the matrices
+# copy-on-write instead of receiving pickled copies per task.
+_shared = {}
+
+def connect_db():
+    return get_pool(min_size=1, max_size=2).acquire()
+
+def get_ratings():
+    connection = connect_db()
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT User_id, Movie_id, Rating_value FROM rating")
+        ratings = cursor.fetchall()
+    connection.close()
+    return ratings
+
+def build_user_matrix(ratings):
+    user_ids = np.array(sorted({r['User_id'] for r in ratings}), dtype=np.int64)
+    movie_ids = np.array(sorted({r['Movie_id'] for r in ratings}), dtype=np.int64)
+    rows = np.searchsorted(user_ids, np.fromiter((r['User_id'] for r in ratings), dtype=np.int64, count=len(ratings)))
+    cols = np.searchsorted(movie_ids, np.fromiter((r['Movie_id'] for r in ratings), dtype=np.int64, count=len(ratings)))
+    values = np.fromiter((r['Rating_value'] for r in ratings), dtype=np.float64, count=len(ratings))
+    matrix = sp.csr_matrix((values, (rows, cols)), shape=(len(user_ids), len(movie_ids)))
+    matrix.sum_duplicates()
+    return user_ids, movie_ids, matrix
+
+def score_block(bounds):
+    # Same rules as CollaborativeModel.recommend, for a block of users at once:
+    # top-3 neighbours with similarity >= 0.2, average of rating * similarity
+    # over the neighbours' movies rated above 3, excluding already-rated movies.
+    start, stop = bounds
+    matrix, normalized, liked = _shared['matrix'], _shared['normalized'], _shared['liked']
+    top_n, neighbours = _shared['top_n'], _shared['neighbours']
+    n_users = matrix.shape[0]
+    k = min(neighbours, n_users - 1)
+    results = []
+    if k <= 0: return results
+
+    similarities = (normalized[start:stop] @ normalized.T).toarray()
+    rows = np.arange(stop - start)
+    similarities[rows, rows + start] = -np.inf
+    top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(similarities, top, axis=1)
+    keep = top_scores >= _shared['min_similarity']
+    weights = sp.csr_matrix((top_scores[keep], (np.broadcast_to(rows[:, None], top.shape)[keep], top[keep])),
+                            shape=(stop - start, n_users))
+
+    score_sum = (weights @ liked).toarray()
+    score_count = ((weights > 0).astype(np.float64) @ (liked > 0).astype(np.float64)).toarray()
+    averages = np.divide(score_sum, score_count, out=np.full_like(score_sum, -np.inf), where=score_count > 0)
+    rated = matrix[start:stop]
+    averages[rated.nonzero()] = -np.inf
+
+    n = min(top_n, averages.shape[1])
+    if n == 0: return results
+    best = np.argpartition(-averages, n - 1, axis=1)[:, :n]
+    best_scores = np.take_along_axis(averages, best, axis=1)
+    order = np.argsort(-best_scores, axis=1, kind='stable')
+    best, best_scores = np.take_along_axis(best, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+    for offset in range(stop - start):
+        picked = best[offset][np.isfinite(best_scores[offset])]
+        results.append((start + offset, picked))
+    return results
+
+def calculate_user_recommendations(user_ids, movie_ids, matrix, top_n=TOP_N, block_size=BLOCK_SIZE, workers=WORKERS):
+    _shared.update({
+        'matrix': matrix,
+        'normalized': normalize(matrix, norm='l2', axis=1),
+        'liked': matrix.multiply(matrix > MIN_RATING).tocsr(),
+        'top_n': top_n, 'neighbours': NEIGHBOURS, 'min_similarity': MIN_SIMILARITY,
+    })
+    blocks = [(start, min(start + block_size, len(user_ids))) for start in range(0, len(user_ids), block_size)]
+    recommendations = {}
+    if workers > 1 and len(blocks) > 1:
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork')) as executor:
+            block_results = executor.map(score_block, blocks)
+            for results in block_results:
+                for row, picked in results:
+                    recommendations[int(user_ids[row])] = movie_ids[picked].tolist()
+    else:
+        for bounds in blocks:
+            for row, picked in score_block(bounds):
+                recommendations[int(user_ids[row])] = movie_ids[picked].tolist()
+    return recommendations
+
+def save_user_recommendations(recommendations, algo_type='collaborative'):
+    connection = connect_db()
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS user_recommendations (
+                User_id INT NOT NULL,
+                algo_type VARCHAR(32) NOT NULL,
+                movie_ids TEXT NOT NULL,
+                generated_at DATETIME NOT NULL,
+                PRIMARY KEY (User_id, algo_type)
+            )
+        """)
+    connection.commit()
+    connection.close()
+    generated_at = time.strftime('%Y-%m-%d %H:%M:%S')
+    user_column = np.array(list(recommendations.keys()), dtype=object)
+    lists = np.array([json.dumps(ids) for ids in recommendations.values()], dtype=object)
+    shadow_load('user_recommendations', ('User_id', 'algo_type', 'movie_ids', 'generated_at'),
+                (user_column, np.full(len(lists), algo_type, dtype=object), lists,
+                 np.full(len(lists), generated_at, dtype=object)))
+    return generated_at
+
+def generate_user_recommendations(top_n=TOP_N, block_size=BLOCK_SIZE, workers=WORKERS):
+    started = time.perf_counter()
+    print("Extracting ratings...")
+    user_ids, movie_ids, matrix = build_user_matrix(get_ratings())
+    print(f"Scoring {len(user_ids)} users in blocks of {block_size} across {workers} processes...")
+    recommendations = calculate_user_recommendations(user_ids, movie_ids, matrix, top_n, block_size, workers)
+    print("Loading precomputed lists into user_recommendations...")
+    generated_at = save_user_recommendations(recommendations)
+    print(f"Stored {len(recommendations)} user lists generated at {generated_at} in {time.perf_counter() - started:.1f}s.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--top-n', type=int, default=TOP_N)
+    parser.add_argument('--block-size', type=int, default=BLOCK_SIZE, help='users scored per vectorized block')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='processes scoring blocks in parallel')
+    args = parser.parse_args()
+    generate_user_recommendations(args.top_n, args.block_size, args.workers)
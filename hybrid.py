@@ -0,0 +1,52 @@
+import numpy as np
+
+CONTENT_WEIGHT = 0.5
+COLLABORATIVE_WEIGHT = 0.5
+OVERLAP_BOOST = 0.25
+CANDIDATES = 50
+
+
+def _normalized(scores):
+    # Min-max to [0, 1] so cosine similarities and predicted ratings are comparable.
+    if len(scores) == 0: return scores
+    low, high = scores.min(), scores.max()
+    if high - low <= 1e-12: return np.ones_like(scores)
+    return (scores - low) / (high - low)
+
+
+def _as_arrays(candidates):
+    if not candidates: return np.zeros(0, dtype=np.int64), np.zeros(0)
+    ids, scores = zip(*candidates)
+    return np.asarray(ids, dtype=np.int64), np.asarray(scores, dtype=np.float64)
+
+
+def rank_hybrid(content_candidates, collaborative_candidates, excluded_ids=(), top_n=10,
+                content_weight=CONTENT_WEIGHT, collaborative_weight=COLLABORATIVE_WEIGHT, overlap_boost=OVERLAP_BOOST):
+    # Each candidate list is [(movie_id, score), ...]. Scores are normalised
+    # per source, blended with the given weights, and movies proposed by both
+    # sources get an extra boost. Excluded ids (already rated or watchlisted)
+    # never make the final list.
+    content_ids, content_scores = _as_arrays(content_candidates)
+    collaborative_ids, collaborative_scores = _as_arrays(collaborative_candidates)
+    all_ids = np.union1d(content_ids, collaborative_ids)
+    if len(all_ids) == 0: return []
+
+    blended = np.zeros(len(all_ids))
+    in_content = np.zeros(len(all_ids), dtype=bool)
+    in_collaborative = np.zeros(len(all_ids), dtype=bool)
+    if len(content_ids):
+        positions = np.searchsorted(all_ids, content_ids)
+        blended[positions] += content_weight * _normalized(content_scores)
+        in_content[positions] = True
+    if len(collaborative_ids):
+        positions = np.searchsorted(all_ids, collaborative_ids)
+        blended[positions] += collaborative_weight * _normalized(collaborative_scores)
+        in_collaborative[positions] = True
+    blended += overlap_boost * (in_content & in_collaborative)
+    if len(excluded_ids):
+        blended[np.isin(all_ids, np.asarray(list(excluded_ids), dtype=np.int64))] = -np.inf
+
+    n = min(top_n, len(all_ids))
+    top = np.argpartition(-blended, n - 1)[:n]
+    top = top[np.argsort(-blended[top], kind='stable')]
+    return [int(movie_id) for movie_id in all_ids[top[np.isfinite(blended[top])]]]
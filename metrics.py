@@ -0,0 +1,178 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_QUERY_SECONDS = 0.5
+MAX_STATEMENTS = 200
+STATEMENT_LENGTH = 160
+WHITESPACE = re.compile(r'\s+')
+PLACEHOLDER_LIST = re.compile(r'%s(?:\s*,\s*%s)+')
+
+
+class Histogram:
+    # Cumulative-on-render buckets: observe() only bumps one slot, so the hot
+    # path is a bisect and three additions under the registry lock.
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Timer:
+    __slots__ = ('registry', 'name', 'labels', 'started')
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, self.labels, time.perf_counter() - self.started)
+        return False
+
+
+class TimedCursor:
+    # Wraps a pymysql cursor and records per-statement latency and row counts.
+    # Statements are keyed on their normalised text; parameters are never
+    # recorded, so password hashes and emails stay out of metrics and logs.
+    def __init__(self, cursor, registry):
+        self._cursor = cursor
+        self._registry = registry
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._cursor.__exit__(*exc)
+
+    def execute(self, query, args=None):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(query, args)
+        finally:
+            self._registry.observe_query(query, time.perf_counter() - started, self._cursor.rowcount)
+
+    def executemany(self, query, args):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(query, args)
+        finally:
+            self._registry.observe_query(query, time.perf_counter() - started, self._cursor.rowcount)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs: return ''
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in pairs) + '}'
+
+
+class MetricsRegistry:
+    # In-process histograms and counters rendered in the Prometheus text
+    # format. Labels are tuples of (name, value) pairs; callers keep their
+    # cardinality bounded (routes and statements come from fixed sets).
+    def __init__(self, slow_query_seconds=SLOW_QUERY_SECONDS, max_statements=MAX_STATEMENTS):
+        self.slow_query_seconds = slow_query_seconds
+        self.max_statements = max_statements
+        self._histograms = {}
+        self._counters = {}
+        self._statements = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def observe(self, name, labels, value):
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None: histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name, labels=(), amount=1):
+        key = (name, labels)
+        with self._lock: self._counters[key] = self._counters.get(key, 0) + amount
+
+    def timer(self, name, labels=()):
+        return Timer(self, name, labels)
+
+    def phase(self, operation, phase):
+        return Timer(self, 'phase_duration_seconds', (('operation', operation), ('phase', phase)))
+
+    def statement_label(self, query):
+        label = self._statements.get(query)
+        if label is None:
+            label = PLACEHOLDER_LIST.sub('%s, ...', WHITESPACE.sub(' ', query).strip())[:STATEMENT_LENGTH]
+            # IN (...) lists built per request would otherwise grow this map without bound.
+            if len(self._statements) < self.max_statements: self._statements[query] = label
+        return label
+
+    def observe_query(self, query, elapsed, rows):
+        statement = self.statement_label(query)
+        labels = (('statement', statement),)
+        self.observe('db_query_duration_seconds', labels, elapsed)
+        if rows and rows > 0: self.inc('db_query_rows_total', labels, rows)
+        if elapsed >= self.slow_query_seconds:
+            self.inc('db_slow_queries_total', labels)
+            print(f"Slow query ({elapsed * 1000:.0f} ms, {rows} rows): {statement}")
+
+    def wrap_cursor(self, cursor):
+        return TimedCursor(cursor, self)
+
+    def add_collector(self, prefix, collect):
+        # collect() returns a dict of numbers, e.g. a cache's stats(); values
+        # are exported as gauges named <prefix>_<key>.
+        self._collectors.append((prefix, collect))
+
+    def render(self):
+        with self._lock:
+            histograms = [(name, labels, list(h.counts), h.total, h.count, h.buckets) for (name, labels), h in self._histograms.items()]
+            counters = list(self._counters.items())
+        lines = []
+        for name in sorted({h[0] for h in histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for _, labels, counts, total, count, buckets in sorted((h for h in histograms if h[0] == name), key=lambda h: h[1]):
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{format_labels(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_bucket{format_labels(labels, [('le', '+Inf')])} {count}")
+                lines.append(f"{name}_sum{format_labels(labels)} {total}")
+                lines.append(f"{name}_count{format_labels(labels)} {count}")
+        for name in sorted({key[0] for key, _ in counters}):
+            lines.append(f"# TYPE {name} counter")
+            for (_, labels), value in sorted((c for c in counters if c[0][0] == name), key=lambda c: c[0][1]):
+                lines.append(f"{name}{format_labels(labels)} {value}")
+        for prefix, collect in self._collectors:
+            try:
+                values = collect()
+            except Exception as e:
+                print(f"Metrics collector {prefix} failed: {e}")
+                continue
+            for key, value in sorted(values.items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)): continue
+                lines.append(f"# TYPE {prefix}_{key} gauge")
+                lines.append(f"{prefix}_{key} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
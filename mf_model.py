@@ -0,0 +1,90 @@
+import threading
+import numpy as np
+import model_registry
+
+MODEL_NAME = 'mf'
+
+
+def write_factors(user_ids, user_factors, item_ids, item_factors, meta, registry_dir=model_registry.REGISTRY_DIR):
+    return model_registry.publish(MODEL_NAME, {
+        'user_ids': np.asarray(user_ids, dtype=np.int64), 'user_factors': np.asarray(user_factors, dtype=np.float32),
+        'item_ids': np.asarray(item_ids, dtype=np.int64), 'item_factors': np.asarray(item_factors, dtype=np.float32),
+    }, meta, registry_dir)
+
+
+class FactorModel:
+    # Memory-mapped user and item factors from generate_mf_model.py. Scoring a
+    # user is one (items x k) @ (k,) product plus an argpartition; users the
+    # model has not seen, or who rated since it was trained, are folded in by
+    # solving one regularised k x k least-squares problem against the item factors.
+    def __init__(self, name=MODEL_NAME, registry_dir=model_registry.REGISTRY_DIR):
+        self.name = name
+        self.registry_dir = registry_dir
+        self._reload_lock = threading.Lock()
+        self._current = None
+        self.stale_users = set()
+        self.on_reload = None
+
+    @property
+    def version(self):
+        current = self._current
+        return current[0] if current else None
+
+    def reload(self, version=None):
+        # Same swap-one-reference rule as SimilarityIndex.reload.
+        with self._reload_lock:
+            if version is None: version = model_registry.current_version(self.name, self.registry_dir)
+            previous = self._current
+            if version is None or (previous is not None and previous[0] == version): return False
+            version, arrays, meta = model_registry.load(self.name, version, registry_dir=self.registry_dir)
+            self._current = (version, arrays['user_ids'], arrays['user_factors'], arrays['item_ids'], arrays['item_factors'], meta)
+            # Flags mark users who rated after the old model was trained; a rollback keeps them.
+            if previous is None or version > previous[0]: self.stale_users = set()
+        if previous is not None and self.on_reload: self.on_reload()
+        return True
+
+    def mark_user_stale(self, user_id):
+        self.stale_users.add(user_id)
+
+    def fold_in(self, ratings, item_ids, item_factors, meta):
+        # ratings: {movie_id: value}. Movies the model has never seen carry no signal.
+        movie_ids = np.fromiter(ratings.keys(), dtype=np.int64, count=len(ratings))
+        values = np.fromiter(ratings.values(), dtype=np.float64, count=len(ratings))
+        cols = np.searchsorted(item_ids, movie_ids)
+        known = (cols < len(item_ids)) & (item_ids[np.minimum(cols, len(item_ids) - 1)] == movie_ids)
+        if not known.any(): return None
+        factors = np.asarray(item_factors[cols[known]], dtype=np.float64)
+        k = factors.shape[1]
+        a = factors.T @ factors + meta.get('regularization', 0.05) * known.sum() * np.eye(k)
+        return np.linalg.solve(a, factors.T @ (values[known] - meta.get('global_mean', 0.0)))
+
+    def recommend(self, user_id, ratings, newest_rating_id=0, top_n=10, with_scores=False):
+        # Returns None when no model has been trained yet so callers can fall back.
+        current = self._current
+        if current is None: return None
+        _, user_ids, user_factors, item_ids, item_factors, meta = current
+        if len(item_ids) == 0: return None
+        row = int(np.searchsorted(user_ids, user_id)) if len(user_ids) else 0
+        trained = row < len(user_ids) and user_ids[row] == user_id
+        if trained and newest_rating_id <= meta.get('max_rating_id', 0) and user_id not in self.stale_users:
+            vector = np.asarray(user_factors[row], dtype=np.float64)
+        elif ratings:
+            vector = self.fold_in(ratings, item_ids, item_factors, meta)
+        else:
+            vector = None
+        if vector is None: return []
+
+        scores = np.asarray(item_factors @ vector.astype(np.float32))
+        if ratings:
+            rated = np.fromiter(ratings.keys(), dtype=np.int64, count=len(ratings))
+            cols = np.searchsorted(item_ids, rated)
+            cols = cols[(cols < len(item_ids)) & (item_ids[np.minimum(cols, len(item_ids) - 1)] == rated)]
+            scores[cols] = -np.inf
+        n = min(top_n, len(scores))
+        if n == 0: return []
+        top = np.argpartition(-scores, n - 1)[:n]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        top = top[np.isfinite(scores[top])]
+        if with_scores:
+            return [(int(item_ids[col]), float(scores[col]) + meta.get('global_mean', 0.0)) for col in top]
+        return [int(item_ids[col]) for col in top]
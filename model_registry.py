@@ -0,0 +1,157 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+import numpy as np
+from write_behind import fsync_dir
+
+REGISTRY_DIR = 'models'
+KEEP_VERSIONS = 5
+CURRENT_LINK = 'current'
+MANIFEST = 'manifest.json'
+
+
+class ModelRegistryError(Exception):
+    pass
+
+
+def model_dir(name, registry_dir=REGISTRY_DIR):
+    return os.path.join(registry_dir, name)
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def remove_legacy_layout(base):
+    # Older builds published <name> as a symlink to sibling <name>.<timestamp>.<pid>
+    # directories. Processes still mapping those keep working after the unlink.
+    if not os.path.islink(base): return
+    os.remove(base)
+    for path in glob.glob(f"{base}.[0-9]*.[0-9]*") + glob.glob(f"{base}.link.tmp"):
+        if os.path.isdir(path) and not os.path.islink(path): shutil.rmtree(path, ignore_errors=True)
+        else: os.remove(path)
+
+def publish(name, arrays, meta=None, registry_dir=REGISTRY_DIR, keep=KEEP_VERSIONS, activate=True):
+    # Layout: <registry_dir>/<name>/<version>/{<array>.npy, manifest.json} and a
+    # `current` symlink. A version is written and fsynced in a hidden staging
+    # directory, renamed into place whole, and only then made current.
+    base = model_dir(name, registry_dir)
+    remove_legacy_layout(base)
+    os.makedirs(base, exist_ok=True)
+    version = time.strftime('%Y%m%d%H%M%S')
+    suffix = 0
+    while os.path.exists(os.path.join(base, version)):
+        suffix += 1
+        version = f"{time.strftime('%Y%m%d%H%M%S')}.{suffix}"
+    staging = os.path.join(base, f".{version}.tmp")
+    os.makedirs(staging)
+    try:
+        files = {}
+        for key, array in arrays.items():
+            path = os.path.join(staging, f"{key}.npy")
+            with open(path, 'wb') as f:
+                np.save(f, np.asarray(array))
+                f.flush()
+                os.fsync(f.fileno())
+            files[f"{key}.npy"] = {'sha256': file_checksum(path), 'bytes': os.path.getsize(path)}
+        manifest = {'name': name, 'version': version, 'created_at': time.strftime('%Y-%m-%d %H:%M:%S'), 'files': files, 'meta': meta or {}}
+        with open(os.path.join(staging, MANIFEST), 'w') as f:
+            json.dump(manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(staging, os.path.join(base, version))
+        fsync_dir(base)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    if activate: set_current(name, version, registry_dir)
+    prune(name, keep, registry_dir)
+    return version
+
+def versions(name, registry_dir=REGISTRY_DIR):
+    base = model_dir(name, registry_dir)
+    if not os.path.isdir(base): return []
+    return sorted(entry for entry in os.listdir(base)
+                  if not entry.startswith('.') and entry != CURRENT_LINK and os.path.isfile(os.path.join(base, entry, MANIFEST)))
+
+def current_version(name, registry_dir=REGISTRY_DIR):
+    link = os.path.join(model_dir(name, registry_dir), CURRENT_LINK)
+    return os.path.basename(os.readlink(link)) if os.path.islink(link) else None
+
+def read_manifest(name, version, registry_dir=REGISTRY_DIR):
+    try:
+        with open(os.path.join(model_dir(name, registry_dir), version, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        raise ModelRegistryError(f"No readable manifest for {name} version {version}: {e}")
+
+def set_current(name, version, registry_dir=REGISTRY_DIR):
+    read_manifest(name, version, registry_dir)
+    base = model_dir(name, registry_dir)
+    tmp_link = os.path.join(base, f".{CURRENT_LINK}.tmp")
+    if os.path.lexists(tmp_link): os.remove(tmp_link)
+    os.symlink(version, tmp_link)
+    os.replace(tmp_link, os.path.join(base, CURRENT_LINK))
+    fsync_dir(base)
+
+def rollback(name, version=None, registry_dir=REGISTRY_DIR):
+    # Without an explicit version, step back to the one published before current.
+    available = versions(name, registry_dir)
+    current = current_version(name, registry_dir)
+    if version is None:
+        older = [v for v in available if current is None or v < current]
+        if not older: raise ModelRegistryError(f"No version of {name} older than {current}")
+        version = older[-1]
+    elif version not in available:
+        raise ModelRegistryError(f"Unknown version {version} of {name}")
+    load(name, version, registry_dir=registry_dir)
+    set_current(name, version, registry_dir)
+    return version
+
+def prune(name, keep=KEEP_VERSIONS, registry_dir=REGISTRY_DIR):
+    # Processes that still map a removed version keep working: unlinked files
+    # stay valid until their last mapping goes away.
+    current = current_version(name, registry_dir)
+    old = [v for v in versions(name, registry_dir) if v != current]
+    for version in old[:max(0, len(old) - (keep - 1))]:
+        shutil.rmtree(os.path.join(model_dir(name, registry_dir), version), ignore_errors=True)
+
+def load(name, version=None, verify=True, registry_dir=REGISTRY_DIR):
+    # Returns (version, {key: memory-mapped array}, meta). Verifying reads every
+    # file once, which also pulls the pages into the page cache before the
+    # caller swaps the model in.
+    if version is None: version = current_version(name, registry_dir)
+    if version is None: raise ModelRegistryError(f"No current version of {name}")
+    manifest = read_manifest(name, version, registry_dir)
+    version_dir = os.path.join(model_dir(name, registry_dir), version)
+    arrays = {}
+    for filename, info in manifest['files'].items():
+        path = os.path.join(version_dir, filename)
+        if verify and file_checksum(path) != info['sha256']:
+            raise ModelRegistryError(f"Checksum mismatch for {name} version {version}: {filename}")
+        try:
+            arrays[filename[:-len('.npy')]] = np.load(path, mmap_mode='r')
+        except (OSError, ValueError) as e:
+            raise ModelRegistryError(f"Cannot map {path}: {e}")
+    return version, arrays, manifest['meta']
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('name', help='model name, e.g. similarity_index or mf')
+    parser.add_argument('--rollback', action='store_true', help='make the previous version current')
+    parser.add_argument('--version', help='with --rollback, the version to make current')
+    parser.add_argument('--registry-dir', default=REGISTRY_DIR)
+    args = parser.parse_args()
+    if args.rollback:
+        print(f"{args.name} now at version {rollback(args.name, args.version, args.registry_dir)}; send SIGHUP to the server to load it.")
+    else:
+        current = current_version(args.name, args.registry_dir)
+        for version in versions(args.name, args.registry_dir):
+            meta = read_manifest(args.name, version, args.registry_dir)['meta']
+            print(f"{'*' if version == current else ' '} {version} {json.dumps(meta)}")
@@ -0,0 +1,122 @@
+import importlib.machinery
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash
+
+HASH_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+MAX_PENDING = 64
+HASH_TIMEOUT = 10.0
+
+
+class HashPoolBusy(Exception):
+    pass
+
+
+def _timed_call(fn, args, submitted_at):
+    started = time.time()
+    result = fn(*args)
+    return result, started - submitted_at, time.time() - started
+
+def _submit_without_main(executor, fn, *args):
+    # spawn children re-import the parent's __main__ (server.py, with sklearn,
+    # scipy, jinja and every module singleton) unless its spec is named
+    # '__main__'. Workers are launched inside submit(), so hiding the spec for
+    # the call keeps them down to this module and werkzeug.
+    main = sys.modules['__main__']
+    spec = getattr(main, '__spec__', None)
+    main.__spec__ = importlib.machinery.ModuleSpec('__main__', None)
+    try: return executor.submit(fn, *args)
+    finally: main.__spec__ = spec
+
+
+class PasswordHasher:
+    # Runs the deliberately slow KDF calls in a bounded process pool so a
+    # login burst cannot starve the threads that serve pages. When more than
+    # max_pending calls are waiting, new ones fail fast with HashPoolBusy.
+    def __init__(self, workers=HASH_WORKERS, max_pending=MAX_PENDING, timeout=HASH_TIMEOUT):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._submit_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._stats_lock = threading.Lock()
+        self.counters = {'completed': 0, 'rejected': 0, 'failed': 0, 'timeouts': 0, 'pool_restarts': 0, 'pending': 0,
+                         'queue_wait_total': 0.0, 'queue_wait_max': 0.0, 'hash_time_total': 0.0, 'hash_time_max': 0.0}
+
+    def _pool(self):
+        # Created on first use so each prefork worker gets its own pool; spawn
+        # avoids forking a process that already runs server threads.
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    def _restart_pool(self, broken):
+        # A crashed worker breaks the whole executor; the next call gets a fresh one.
+        with self._executor_lock:
+            if self._executor is not broken: return
+            self._executor = None
+        with self._stats_lock: self.counters['pool_restarts'] += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, future=None):
+        with self._stats_lock: self.counters['pending'] -= 1
+        self._slots.release()
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock: self.counters['rejected'] += 1
+            raise HashPoolBusy("Password hashing queue is full")
+        with self._stats_lock: self.counters['pending'] += 1
+        executor = self._pool()
+        try:
+            with self._submit_lock: future = _submit_without_main(executor, _timed_call, fn, args, time.time())
+        except (BrokenProcessPool, RuntimeError) as e:
+            self._release()
+            self._restart_pool(executor)
+            with self._stats_lock: self.counters['failed'] += 1
+            raise HashPoolBusy(f"Password hashing pool unavailable: {e}")
+        # The slot is held until the task really leaves the executor, not just
+        # until this caller gives up, so a backlog cannot outgrow max_pending.
+        future.add_done_callback(self._release)
+        try:
+            result, queue_wait, hash_time = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            with self._stats_lock: self.counters['timeouts'] += 1
+            raise HashPoolBusy(f"Password hashing took longer than {self.timeout}s")
+        except BrokenProcessPool as e:
+            self._restart_pool(executor)
+            with self._stats_lock: self.counters['failed'] += 1
+            raise HashPoolBusy(f"Password hashing worker died: {e}")
+        except Exception:
+            with self._stats_lock: self.counters['failed'] += 1
+            raise
+        with self._stats_lock:
+            self.counters['completed'] += 1
+            self.counters['queue_wait_total'] += queue_wait
+            self.counters['queue_wait_max'] = max(self.counters['queue_wait_max'], queue_wait)
+            self.counters['hash_time_total'] += hash_time
+            self.counters['hash_time_max'] = max(self.counters['hash_time_max'], hash_time)
+        return result
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def stats(self):
+        with self._stats_lock: result = dict(self.counters)
+        completed = result['completed']
+        result['queue_wait_avg'] = result['queue_wait_total'] / completed if completed else 0.0
+        result['hash_time_avg'] = result['hash_time_total'] / completed if completed else 0.0
+        return result
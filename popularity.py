@@ -0,0 +1,127 @@
+import threading
+import time
+import pymysql
+
+PRIOR_WEIGHT = 25
+TOP_N = 10
+CANDIDATES = 100
+LIST_TTL = 300.0
+CREATE_TABLES_SQL = (
+    """CREATE TABLE IF NOT EXISTS movie_popularity (
+        Movie_id INT NOT NULL PRIMARY KEY,
+        Genre_id INT NULL,
+        rating_count INT NOT NULL,
+        rating_sum BIGINT NOT NULL,
+        bayesian_score DOUBLE NOT NULL,
+        KEY popularity_score (bayesian_score),
+        KEY popularity_genre_score (Genre_id, bayesian_score)
+    )""",
+    """CREATE TABLE IF NOT EXISTS popularity_totals (
+        id TINYINT NOT NULL PRIMARY KEY,
+        rating_count BIGINT NOT NULL,
+        rating_sum BIGINT NOT NULL
+    )""",
+)
+# bayesian_score = (rating_sum + C * m) / (rating_count + C): a movie with few
+# ratings is pulled towards the global mean m instead of topping the list.
+UPSERT_SQL = """INSERT INTO movie_popularity (Movie_id, Genre_id, rating_count, rating_sum, bayesian_score)
+    VALUES (%s, (SELECT Genre_id FROM movie WHERE Movie_id = %s), %s, %s, (%s + %s * %s) / (%s + %s))
+    ON DUPLICATE KEY UPDATE Genre_id = VALUES(Genre_id), rating_count = rating_count + VALUES(rating_count),
+        rating_sum = rating_sum + VALUES(rating_sum), bayesian_score = (rating_sum + %s * %s) / (rating_count + %s)"""
+
+
+def create_tables(cursor):
+    for sql in CREATE_TABLES_SQL:
+        cursor.execute(sql)
+
+def read_rating_changes(cursor, ratings):
+    # ratings: [(user_id, movie_id, new_value)]. Must run in the writing
+    # transaction before the upsert; FOR UPDATE keeps the old values stable
+    # until commit, so concurrent flushers cannot both count one rating.
+    pairs = [(user_id, movie_id) for user_id, movie_id, _ in ratings]
+    cursor.execute(f"SELECT User_id, Movie_id, Rating_value FROM rating WHERE (User_id, Movie_id) IN ({', '.join(['(%s, %s)'] * len(pairs))}) FOR UPDATE",
+                   [value for pair in pairs for value in pair])
+    previous = {(row['User_id'], row['Movie_id']): row['Rating_value'] for row in cursor.fetchall()}
+    return [(movie_id, previous.get((user_id, movie_id)), value) for user_id, movie_id, value in ratings]
+
+def apply_rating_changes(cursor, changes, prior_weight=PRIOR_WEIGHT):
+    # changes: [(movie_id, old_value or None, new_value)]. A new rating adds one
+    # to the count; a re-rating only shifts the sum. No GROUP BY over rating.
+    deltas = {}
+    for movie_id, old_value, new_value in changes:
+        count_delta, sum_delta = deltas.get(movie_id, (0, 0))
+        deltas[movie_id] = (count_delta + (old_value is None), sum_delta + new_value - (old_value or 0))
+    deltas = {movie_id: delta for movie_id, delta in deltas.items() if delta != (0, 0)}
+    if not deltas: return 0
+    count_delta = sum(delta[0] for delta in deltas.values())
+    sum_delta = sum(delta[1] for delta in deltas.values())
+    cursor.execute("INSERT INTO popularity_totals (id, rating_count, rating_sum) VALUES (1, %s, %s) ON DUPLICATE KEY UPDATE rating_count = rating_count + VALUES(rating_count), rating_sum = rating_sum + VALUES(rating_sum)",
+                   (count_delta, sum_delta))
+    cursor.execute("SELECT rating_count, rating_sum FROM popularity_totals WHERE id = 1")
+    totals = cursor.fetchone()
+    prior_mean = float(totals['rating_sum']) / totals['rating_count'] if totals['rating_count'] else 0.0
+    cursor.executemany(UPSERT_SQL, [(movie_id, movie_id, count, total, total, prior_weight, prior_mean, count, prior_weight, prior_weight, prior_mean, prior_weight)
+                                    for movie_id, (count, total) in deltas.items()])
+    return len(deltas)
+
+def rebuild(connection, prior_weight=PRIOR_WEIGHT):
+    # Full resync, e.g. nightly or to bootstrap the tables. LOCK IN SHARE MODE
+    # holds back write-behind flushers until commit, so no increment lands in
+    # between the scan and the rewrite; their queued ratings just wait.
+    with connection.cursor() as cursor:
+        create_tables(cursor)
+        connection.commit()
+        cursor.execute("SELECT COUNT(*) AS rating_count, COALESCE(SUM(Rating_value), 0) AS rating_sum FROM rating LOCK IN SHARE MODE")
+        totals = cursor.fetchone()
+        prior_mean = float(totals['rating_sum']) / totals['rating_count'] if totals['rating_count'] else 0.0
+        cursor.execute("""INSERT INTO movie_popularity (Movie_id, Genre_id, rating_count, rating_sum, bayesian_score)
+            SELECT t.Movie_id, t.Genre_id, t.rating_count, t.rating_sum, (t.rating_sum + %s * %s) / (t.rating_count + %s)
+            FROM (SELECT r.Movie_id, m.Genre_id, COUNT(*) AS rating_count, SUM(r.Rating_value) AS rating_sum
+                  FROM rating r JOIN movie m ON m.Movie_id = r.Movie_id GROUP BY r.Movie_id, m.Genre_id) t
+            ON DUPLICATE KEY UPDATE Genre_id = t.Genre_id, rating_count = t.rating_count, rating_sum = t.rating_sum,
+                bayesian_score = (t.rating_sum + %s * %s) / (t.rating_count + %s)""",
+                       (prior_weight, prior_mean, prior_weight, prior_weight, prior_mean, prior_weight))
+        cursor.execute("DELETE p FROM movie_popularity p LEFT JOIN rating r ON r.Movie_id = p.Movie_id WHERE r.Movie_id IS NULL")
+        cursor.execute("REPLACE INTO popularity_totals (id, rating_count, rating_sum) VALUES (1, %s, %s)", (totals['rating_count'], totals['rating_sum']))
+    connection.commit()
+    return totals['rating_count'], prior_mean
+
+
+class PopularityLists:
+    # Top-N by Bayesian score, overall and per genre, read off the
+    # (Genre_id, bayesian_score) index and kept for LIST_TTL seconds, so a
+    # cold-start or fallback request is a dict lookup plus an exclusion filter.
+    def __init__(self, ttl=LIST_TTL, candidates=CANDIDATES):
+        self.ttl = ttl
+        self.candidates = candidates
+        self._lists = {}
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'refreshes': 0, 'errors': 0}
+
+    def top(self, cursor, genre_id=None, n=TOP_N, exclude=()):
+        now = time.monotonic()
+        with self._lock: entry = self._lists.get(genre_id)
+        if entry is None or entry[0] < now:
+            try:
+                if genre_id is None:
+                    cursor.execute("SELECT Movie_id FROM movie_popularity ORDER BY bayesian_score DESC LIMIT %s", (self.candidates,))
+                else:
+                    cursor.execute("SELECT Movie_id FROM movie_popularity WHERE Genre_id = %s ORDER BY bayesian_score DESC LIMIT %s", (genre_id, self.candidates))
+                entry = (now + self.ttl, [row['Movie_id'] for row in cursor.fetchall()])
+            except pymysql.MySQLError as e:
+                print(f"Error reading popularity aggregates: {e}")
+                with self._lock: self.counters['errors'] += 1
+                return []
+            with self._lock:
+                self._lists[genre_id] = entry
+                self.counters['refreshes'] += 1
+        else:
+            with self._lock: self.counters['hits'] += 1
+        return [movie_id for movie_id in entry[1] if movie_id not in exclude][:n]
+
+    def invalidate(self):
+        with self._lock: self._lists.clear()
+
+    def stats(self):
+        with self._lock: result = dict(self.counters, lists=len(self._lists))
+        return result
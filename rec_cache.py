@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_MAX_ENTRIES = 10000
+CACHE_TTL = 300.0
+CONTENT_ALGOS = ('content', 'hybrid')
+
+
+class RecommendationCache:
+    # LRU + TTL cache of rendered recommendation lists keyed on
+    # (user_id, algo_type, movie_name). Writes that change a user's inputs
+    # drop that user's entries; similarity rebuilds drop content-based ones.
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._by_user = {}
+        self._generation = 0
+        self._user_generations = {}
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0, 'stale_puts': 0}
+
+    def _drop(self, key):
+        self._entries.pop(key, None)
+        keys = self._by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys: del self._by_user[key[0]]
+
+    def get(self, user_id, algo_type, movie_name):
+        key = (user_id, algo_type, movie_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.counters['misses'] += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                self._drop(key)
+                self.counters['expirations'] += 1
+                self.counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters['hits'] += 1
+            return value
+
+    def token(self, user_id):
+        # Taken before computing a list; put() drops the result if an
+        # invalidation for this user (or everyone) happened in the meantime.
+        with self._lock: return (self._generation, self._user_generations.get(user_id, 0))
+
+    def put(self, user_id, algo_type, movie_name, value, token=None):
+        key = (user_id, algo_type, movie_name)
+        with self._lock:
+            if token is not None and token != (self._generation, self._user_generations.get(user_id, 0)):
+                self.counters['stale_puts'] += 1
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            self._by_user.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.counters['evictions'] += 1
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            self._user_generations[user_id] = self._user_generations.get(user_id, 0) + 1
+            keys = list(self._by_user.get(user_id, ()))
+            for key in keys:
+                self._drop(key)
+            self.counters['invalidations'] += len(keys)
+
+    def invalidate_content(self):
+        self.invalidate_algos(CONTENT_ALGOS)
+
+    def invalidate_algos(self, algo_types):
+        with self._lock:
+            self._generation += 1
+            keys = [key for key in self._entries if key[1] in algo_types]
+            for key in keys:
+                self._drop(key)
+            self.counters['invalidations'] += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self.counters['invalidations'] += len(self._entries)
+            self._entries.clear()
+            self._by_user.clear()
+
+    def stats(self):
+        with self._lock:
+            result = dict(self.counters)
+            result['entries'] = len(self._entries)
+        lookups = result['hits'] + result['misses']
+        result['hit_ratio'] = result['hits'] / lookups if lookups else 0.0
+        return result
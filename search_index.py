@@ -0,0 +1,111 @@
+import threading
+
+NGRAM = 3
+
+
+def normalize_title(text):
+    return ' '.join((text or '').casefold().split())
+
+
+def ngrams(text, n=NGRAM):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class TitleSearchIndex:
+    # In-memory inverted index over movie titles: character trigram postings
+    # for substring search plus per-genre postings, so /browse never needs a
+    # LIKE '%...%' scan or a separate COUNT(*).
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.loaded = False
+        self._reset()
+
+    def _reset(self):
+        self.docs = {}
+        self.gram_postings = {}
+        self.genre_postings = {}
+        self._ordered = {}
+
+    def build(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT Movie_id, Name, Genre_id, Release_year FROM movie")
+            movies = cursor.fetchall()
+        with self._lock:
+            self._reset()
+            for movie in movies:
+                self._add(movie)
+            self.loaded = True
+
+    def ensure_loaded(self, connection):
+        if self.loaded: return
+        with self._lock:
+            if not self.loaded: self.build(connection)
+
+    def _add(self, movie):
+        movie_id = movie['Movie_id']
+        title = normalize_title(movie['Name'])
+        self.docs[movie_id] = (title, movie['Genre_id'], movie['Release_year'] or 0)
+        for gram in ngrams(title):
+            self.gram_postings.setdefault(gram, set()).add(movie_id)
+        self.genre_postings.setdefault(movie['Genre_id'], set()).add(movie_id)
+        self._ordered.clear()
+
+    def remove(self, movie_id):
+        with self._lock:
+            doc = self.docs.pop(movie_id, None)
+            if doc is None: return
+            title, genre_id, _ = doc
+            for gram in ngrams(title):
+                postings = self.gram_postings.get(gram)
+                if postings is not None:
+                    postings.discard(movie_id)
+                    if not postings: del self.gram_postings[gram]
+            postings = self.genre_postings.get(genre_id)
+            if postings is not None:
+                postings.discard(movie_id)
+                if not postings: del self.genre_postings[genre_id]
+            self._ordered.clear()
+
+    def upsert(self, movie):
+        with self._lock:
+            if not self.loaded: return
+            self.remove(movie['Movie_id'])
+            self._add(movie)
+
+    def _by_year(self, genre_id):
+        # Browse order without a search term: newest first, like the SQL path.
+        ordered = self._ordered.get(genre_id)
+        if ordered is None:
+            ids = self.docs.keys() if genre_id is None else self.genre_postings.get(genre_id, ())
+            ordered = sorted(ids, key=lambda movie_id: (-self.docs[movie_id][2], -movie_id))
+            self._ordered[genre_id] = ordered
+        return ordered
+
+    def _relevance(self, movie_id, query):
+        title = self.docs[movie_id][0]
+        if title == query: rank = 0
+        elif title.startswith(query): rank = 1
+        elif any(word.startswith(query) for word in title.split()): rank = 2
+        else: rank = 3
+        return (rank, -self.docs[movie_id][2], -movie_id)
+
+    def search(self, query='', genre_id=None, offset=0, limit=20):
+        # Returns (movie_ids for the page, exact total matches).
+        query = normalize_title(query)
+        with self._lock:
+            if not query:
+                ordered = self._by_year(genre_id)
+                return ordered[offset:offset + limit], len(ordered)
+
+            grams = ngrams(query)
+            if grams:
+                postings = sorted((self.gram_postings.get(gram, set()) for gram in grams), key=len)
+                candidates = set(postings[0]).intersection(*postings[1:])
+            else:
+                candidates = self.docs.keys()
+            if genre_id is not None:
+                candidates = [m for m in candidates if self.docs[m][1] == genre_id]
+            # Trigram hits are only candidates; confirm the substring actually occurs.
+            matches = [m for m in candidates if query in self.docs[m][0]]
+            matches.sort(key=lambda movie_id: self._relevance(movie_id, query))
+            return matches[offset:offset + limit], len(matches)
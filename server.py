@@ -1,44 +1,307 @@
 from http.server import SimpleHTTPRequestHandler, HTTPServer
 import urllib.parse
 import pymysql
-from jinja2 import Environment, FileSystemLoader
+import db_pool
+from collab_model import CollaborativeModel
+import generate_similarity
+from similarity_index import SimilarityIndex
+from mf_model import FactorModel
+import model_registry
+from rec_cache import RecommendationCache
+from search_index import TitleSearchIndex
+from catalogue_cache import CatalogueCache
+from popularity import PopularityLists
+import cache_events
+from hybrid import rank_hybrid, CANDIDATES as HYBRID_CANDIDATES
+from session_store import MemorySessionStore, create_session_store
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
 import os
 from http import cookies
-import uuid
+import signal
 import math
-import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
 import json
-from werkzeug.security import generate_password_hash, check_password_hash
+import argparse
+import queue
+import threading
+import time
+import gzip
+import hashlib
+import shutil
+from password_pool import PasswordHasher, HashPoolBusy
+from metrics import registry as metrics
+import write_behind
+import create_indexes
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 
 PORT = 8000
-sessions = {}
-env = Environment(loader=FileSystemLoader('templates'))
+WORKER_THREADS = 16
+REQUEST_QUEUE_SIZE = 128
+session_store = MemorySessionStore()
+password_hasher = PasswordHasher()
+collab_model = CollaborativeModel()
+content_index = SimilarityIndex()
+rec_cache = RecommendationCache()
+content_index.on_reload = rec_cache.invalidate_content
+mf_model = FactorModel()
+mf_model.on_reload = lambda: rec_cache.invalidate_algos(('collaborative_mf',))
+hot_models = (content_index, mf_model)
+prefork_parent = None
+title_index = TitleSearchIndex()
+catalogue = CatalogueCache()
+popular = PopularityLists()
+write_queue = write_behind.WriteBehindQueue()
+BROWSE_COUNT_TTL = 60
+PRECOMPUTED_MAX_AGE = 86400
+browse_counts = {}
+browse_counts_lock = threading.Lock()
+TEMPLATE_CACHE_DIR = '.jinja_cache'
+MIN_COMPRESS_SIZE = 1024
+os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+env = Environment(loader=FileSystemLoader('templates'), bytecode_cache=FileSystemBytecodeCache(TEMPLATE_CACHE_DIR))
+STATIC_DIR = 'static'
+ASSET_MANIFEST_PATH = os.path.join(STATIC_DIR, 'dist', 'manifest.json')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+METRIC_ROUTES = {
+    '/', '/login', '/register', '/dashboard', '/recommend', '/final', '/profile', '/browse', '/movie', '/logout',
+    '/rate_movie', '/toggle_watchlist', '/update_profile', '/admin', '/admin/movies', '/admin/movie/add',
+    '/admin/movie/edit', '/admin/movie/delete', '/admin/users', '/admin/user/delete', '/admin/user/toggle_admin',
+    '/admin/metrics', '/admin/models', '/admin/models/reload', '/admin/models/rollback'
+}
+metrics.add_collector('db_pool', lambda: db_pool.get_pool().stats())
+metrics.add_collector('rec_cache', lambda: rec_cache.stats())
+metrics.add_collector('catalogue', lambda: catalogue.stats())
+metrics.add_collector('popularity', lambda: popular.stats())
+metrics.add_collector('cache_events', lambda: cache_listener.stats())
+metrics.add_collector('password_hash', lambda: password_hasher.stats())
+metrics.add_collector('sessions', lambda: {'active': session_store.count()})
+metrics.add_collector('write_behind', lambda: write_queue.stats())
+
+
+def load_asset_manifest():
+    try:
+        with open(ASSET_MANIFEST_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+ASSET_MANIFEST_CHECK_INTERVAL = 2.0
+asset_manifest, asset_manifest_mtime, asset_manifest_checked = {}, None, 0.0
+
+def current_asset_manifest():
+    # build_assets.py may run while the server is up; pick up the new manifest
+    # once it is replaced, looking at the file at most every couple of seconds.
+    global asset_manifest, asset_manifest_mtime, asset_manifest_checked
+    now = time.monotonic()
+    if now - asset_manifest_checked < ASSET_MANIFEST_CHECK_INTERVAL: return asset_manifest
+    asset_manifest_checked = now
+    try: mtime = os.stat(ASSET_MANIFEST_PATH).st_mtime_ns
+    except OSError: mtime = None
+    if mtime != asset_manifest_mtime:
+        asset_manifest, asset_manifest_mtime = load_asset_manifest(), mtime
+    return asset_manifest
+
+env.globals['asset'] = lambda name: '/static/' + current_asset_manifest().get(name, name)
+
+
+def invalidate_flushed_users(batch):
+    # Lists computed before the flusher committed were read from the old rows.
+    for user_id in {user_id for _, user_id, _ in batch}:
+        rec_cache.invalidate_user(user_id)
+
+write_queue.on_flushed = invalidate_flushed_users
+
+
+def refresh_similarity_async(movie_id, deleted=False):
+    content_index.mark_stale(movie_id, deleted)
+    target = generate_similarity.remove_movie if deleted else generate_similarity.refresh_movie
+    def run():
+        try:
+            target(int(movie_id))
+            rec_cache.invalidate_content()
+        except Exception as e:
+            print(f"Incremental similarity refresh failed for movie {movie_id}: {e}")
+    threading.Thread(target=run, name=f"similarity-refresh-{movie_id}", daemon=True).start()
+
+
+def reload_models(wait=False):
+    # Each model verifies and maps its new version before swapping one
+    # reference, so requests keep being served from the old version meanwhile.
+    def run():
+        for model in hot_models:
+            try:
+                if model.reload(): print(f"Loaded {model.name} version {model.version} (pid {os.getpid()})")
+            except Exception as e:
+                print(f"Reload of {model.name} failed, keeping version {model.version}: {e}")
+    if wait: return run()
+    threading.Thread(target=run, name="model-reload", daemon=True).start()
+
+
+def request_model_reload():
+    # Under --workers the parent fans SIGHUP out, so every worker reloads, not just this one.
+    if prefork_parent: os.kill(prefork_parent, signal.SIGHUP)
+    else: reload_models()
+
+
+def negotiate_encoding(accept_encoding, available=None):
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try: quality = float(params.strip()[2:])
+            except ValueError: quality = 0.0
+        if coding: accepted[coding.strip().lower()] = quality
+    if available is None: available = ('br', 'gzip') if brotli is not None else ('gzip',)
+    for coding in available:
+        if accepted.get(coding, 0) > 0: return coding
+    return None
+
+
+def compress_body(body, encoding):
+    if encoding == 'br': return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def route_label(path_only):
+    # Unknown paths share one label so scanners cannot blow up metric cardinality.
+    if path_only.startswith('/static/'): return '/static'
+    return path_only if path_only in METRIC_ROUTES else 'other'
+
+
+def invalidate_browse_counts():
+    with browse_counts_lock: browse_counts.clear()
+
+
+def parse_browse_cursor(value):
+    # "<year>_<movie_id>", or "null_<movie_id>" for a movie without a release year.
+    try:
+        year, movie_id = value.split('_', 1)
+        return (None if year == 'null' else int(year)), int(movie_id)
+    except (ValueError, AttributeError):
+        return None
+
+
+def browse_cursor(movie):
+    year = movie['Release_year']
+    return f"{'null' if year is None else year}_{movie['Movie_id']}"
 
 
 def connect_db():
     try:
-        connection = pymysql.connect(
-            host='localhost', user='root', password='', db='movie',
-            charset='utf8mb4', cursorclass=pymysql.cursors.DictCursor
-        )
-        return connection
+        return db_pool.get_pool().acquire()
     except pymysql.MySQLError as e:
         print(f"Error connecting to MySQL Database: {e}")
         return None
 
 
+# Changes made through another prefork worker, replayed from cache_events.
+def apply_rating_event(event):
+    collab_model.update_rating(event['User_id'], event['Movie_id'], event['Value'])
+    mf_model.mark_user_stale(event['User_id'])
+    rec_cache.invalidate_user(event['User_id'])
+
+def apply_user_event(event):
+    if event['Kind'] == 'user_deleted': collab_model.invalidate()
+    rec_cache.invalidate_user(event['User_id'])
+
+def apply_movie_event(event):
+    # The publishing worker already refreshed movie_similarity and the stored
+    # state; here only this process's copies need to catch up.
+    movie_id, deleted = event['Movie_id'], event['Kind'] == 'movie_deleted'
+    content_index.mark_stale(movie_id, deleted)
+    catalogue.invalidate_movie(movie_id)
+    rec_cache.clear()
+    popular.invalidate()
+    invalidate_browse_counts()
+    if deleted:
+        collab_model.invalidate()
+        return title_index.remove(movie_id)
+    connection = connect_db()
+    if not connection: raise pymysql.MySQLError("No DB connection to refresh the title index")
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT Movie_id, Name, Genre_id, Release_year FROM movie WHERE Movie_id = %s", (movie_id,))
+            movie = cursor.fetchone()
+    finally:
+        connection.close()
+    if movie: title_index.upsert(movie)
+
+cache_listener = cache_events.CacheEventListener({
+    'rating': apply_rating_event, 'user': apply_user_event, 'user_deleted': apply_user_event,
+    'movie': apply_movie_event, 'movie_deleted': apply_movie_event,
+})
+
+
+class PooledHTTPServer(HTTPServer):
+    # Accepted sockets go into a bounded queue drained by a fixed set of worker
+    # threads, so a slow /recommend no longer blocks static files or logins.
+    def __init__(self, server_address, handler_class, worker_threads=WORKER_THREADS, queue_size=REQUEST_QUEUE_SIZE):
+        self.request_queue_size = queue_size
+        self.pending_requests = queue.Queue(maxsize=queue_size)
+        super().__init__(server_address, handler_class)
+        self.workers = []
+        for i in range(worker_threads):
+            worker = threading.Thread(target=self.process_queue, name=f"http-worker-{i}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def process_request(self, request, client_address):
+        try:
+            self.pending_requests.put_nowait((request, client_address))
+        except queue.Full:
+            metrics.inc('http_rejected_total')
+            try:
+                request.sendall(b"HTTP/1.0 503 Service Unavailable\r\nRetry-After: 1\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            except OSError:
+                pass
+            self.shutdown_request(request)
+
+    def process_queue(self):
+        while True:
+            request, client_address = self.pending_requests.get()
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+                self.pending_requests.task_done()
+
+
 class MyHandler(SimpleHTTPRequestHandler):
     
    
     def do_GET(self):
+        started, self.status_code = time.perf_counter(), 0
+        try: self.route_get()
+        finally: self.observe_request('GET', started)
+
+    def do_POST(self):
+        started, self.status_code = time.perf_counter(), 0
+        try: self.route_post()
+        finally: self.observe_request('POST', started)
+
+    def send_response(self, code, message=None):
+        self.status_code = code
+        super().send_response(code, message)
+
+    def observe_request(self, method, started):
+        labels = (('method', method), ('route', route_label(urllib.parse.urlparse(self.path).path)))
+        metrics.observe('http_request_duration_seconds', labels, time.perf_counter() - started)
+        metrics.inc('http_requests_total', labels + (('status', self.status_code),))
+
+    def route_get(self):
         parsed_url = urllib.parse.urlparse(self.path)
         path_only = parsed_url.path
         query_params = urllib.parse.parse_qs(parsed_url.query)
 
         if path_only.startswith('/static/'):
-            return super().do_GET()
+            return self.serve_static(path_only)
 
         public_pages = {'/': 'login.html', '/login': 'login.html', '/register': 'register.html'}
         if path_only in public_pages:
@@ -67,7 +330,7 @@ class MyHandler(SimpleHTTPRequestHandler):
         else:
             self.send_error(404, 'Page Not Found')
 
-    def do_POST(self):
+    def route_post(self):
         try:
             path_only = urllib.parse.urlparse(self.path).path
             content_length = int(self.headers['Content-Length'])
@@ -96,19 +359,93 @@ class MyHandler(SimpleHTTPRequestHandler):
         if context is None: context = {}
         try:
             template = env.get_template(template_name)
-            session_info = self.get_session_info()
+            with metrics.phase('serve_template', 'session'):
+                session_info = self.get_session_info()
             if session_info:
                 context['is_admin_session'] = session_info.get('is_admin', False)
                 context['user_id_session'] = session_info.get('user_id')
-            html = template.render(context)
-            self.send_response(200)
-            self.send_header('Content-type', 'text/html; charset=utf-8')
-            self.end_headers()
-            self.wfile.write(html.encode('utf-8'))
+            with metrics.phase('serve_template', 'render'):
+                html = template.render(context)
+            with metrics.phase('serve_template', 'send'):
+                self.send_body(html.encode('utf-8'), 'text/html; charset=utf-8', 'private, no-cache')
         except Exception as e:
             print(f"Template error for {template_name}: {e}")
             self.send_error(500, f"Template error: {e}")
 
+    def send_body(self, body, content_type, cache_control):
+        # The ETag is derived from the rendered bytes, so a repeat request for an
+        # unchanged page gets a bodiless 304 instead of the full HTML again.
+        encoding = negotiate_encoding(self.headers.get('Accept-Encoding')) if len(body) >= MIN_COMPRESS_SIZE else None
+        digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        etag = f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+        if_none_match = self.headers.get('If-None-Match', '')
+        if etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', cache_control)
+            self.send_header('Vary', 'Accept-Encoding, Cookie')
+            self.end_headers()
+            return
+        if encoding: body = compress_body(body, encoding)
+        self.send_response(200)
+        self.send_header('Content-type', content_type)
+        if encoding: self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', cache_control)
+        self.send_header('Vary', 'Accept-Encoding, Cookie')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def serve_static(self, path_only):
+        rel_path = urllib.parse.unquote(path_only[len('/static/'):])
+        static_root = os.path.realpath(STATIC_DIR)
+        full_path = os.path.realpath(os.path.join(static_root, rel_path))
+        if not full_path.startswith(static_root + os.sep) or not os.path.isfile(full_path):
+            return self.send_error(404, 'File not found')
+
+        # build_assets.py writes .br/.gz siblings next to each fingerprinted file.
+        available = [coding for coding, suffix in (('br', '.br'), ('gzip', '.gz')) if os.path.isfile(full_path + suffix)]
+        encoding = negotiate_encoding(self.headers.get('Accept-Encoding'), available) if available else None
+        serve_path = full_path + {'br': '.br', 'gzip': '.gz'}[encoding] if encoding else full_path
+        stat = os.stat(serve_path)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        cache_control = IMMUTABLE_CACHE_CONTROL if rel_path.startswith('dist/') else 'public, no-cache'
+
+        if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', cache_control)
+            self.send_header('Vary', 'Accept-Encoding')
+            self.end_headers()
+            return
+
+        with open(serve_path, 'rb') as f:
+            self.send_response(200)
+            self.send_header('Content-type', self.guess_type(full_path))
+            if encoding: self.send_header('Content-Encoding', encoding)
+            self.send_header('Content-Length', str(stat.st_size))
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', cache_control)
+            self.send_header('Vary', 'Accept-Encoding')
+            self.end_headers()
+            if not hasattr(os, 'sendfile'):
+                return shutil.copyfileobj(f, self.wfile)
+            # Zero-copy: the kernel moves file pages straight to the socket.
+            self.wfile.flush()
+            offset = 0
+            while offset < stat.st_size:
+                sent = os.sendfile(self.connection.fileno(), f.fileno(), offset, stat.st_size - offset)
+                if sent == 0: break
+                offset += sent
+
+    def send_busy(self):
+        self.send_response(503)
+        self.send_header('Retry-After', '2')
+        self.send_header('Content-type', 'text/plain; charset=utf-8')
+        self.end_headers()
+        self.wfile.write(b'Server busy, please retry')
+
     def redirect(self, location):
         self.send_response(303)
         self.send_header('Location', location)
@@ -125,7 +462,7 @@ class MyHandler(SimpleHTTPRequestHandler):
         if "Cookie" in self.headers:
             cookie = cookies.SimpleCookie(self.headers["Cookie"])
             session_id_morsel = cookie.get("session_id")
-            if session_id_morsel: return sessions.get(session_id_morsel.value)
+            if session_id_morsel: return session_store.get(session_id_morsel.value)
         return None
 
     def get_session_user(self):
@@ -146,14 +483,15 @@ class MyHandler(SimpleHTTPRequestHandler):
             with connection.cursor() as cursor:
                 cursor.execute("SELECT User_id, Password, is_admin FROM users WHERE Email=%s", (email,))
                 user = cursor.fetchone()
-            if user and check_password_hash(user['Password'], password):
-                session_id_val = str(uuid.uuid4())
-                sessions[session_id_val] = {'user_id': user['User_id'], 'is_admin': user['is_admin']}
+            if user and password_hasher.verify(user['Password'], password):
+                session_id_val = session_store.create({'user_id': user['User_id'], 'is_admin': user['is_admin']})
                 self.send_response(303)
                 self.set_cookie("session_id", session_id_val, max_age=3600)
                 self.send_header('Location', '/dashboard')
                 self.end_headers()
             else: self.redirect('/login?error=invalid_credentials')
+        except HashPoolBusy:
+            self.send_busy()
         finally:
             if connection: connection.close()
 
@@ -162,7 +500,8 @@ class MyHandler(SimpleHTTPRequestHandler):
         email = data.get('email', [''])[0]
         password = data.get('password', [''])[0]
         if not name or not email or not password: return self.redirect('/register?error=empty_fields')
-        hashed_password = generate_password_hash(password)
+        try: hashed_password = password_hasher.hash(password)
+        except HashPoolBusy: return self.send_busy()
         connection = connect_db()
         if not connection: return self.send_error(500, "DB Error")
         try:
@@ -179,8 +518,7 @@ class MyHandler(SimpleHTTPRequestHandler):
         if "Cookie" in self.headers:
             cookie = cookies.SimpleCookie(self.headers["Cookie"])
             session_id_morsel = cookie.get("session_id")
-            if session_id_morsel and session_id_morsel.value in sessions:
-                del sessions[session_id_morsel.value]
+            if session_id_morsel: session_store.delete(session_id_morsel.value)
         self.send_response(303)
         self.send_header('Set-Cookie', 'session_id=deleted; path=/; expires=Thu, 01 Jan 1970 00:00:00 GMT')
         self.send_header('Location', '/login')
@@ -197,15 +535,30 @@ class MyHandler(SimpleHTTPRequestHandler):
             with connection.cursor() as cursor:
                 cursor.execute("SELECT User_id, Name, Email FROM users WHERE User_id = %s", (user_id,))
                 user_data = cursor.fetchone()
-                cursor.execute("SELECT m.Name AS movie_name, r.Rating_value AS stars FROM rating r JOIN movie m ON r.Movie_id = m.Movie_id WHERE r.User_id = %s ORDER BY r.Rating_id DESC LIMIT 5", (user_id,))
+                cursor.execute("SELECT r.Movie_id, m.Name AS movie_name, r.Rating_value AS stars FROM rating r JOIN movie m ON r.Movie_id = m.Movie_id WHERE r.User_id = %s ORDER BY r.Rating_id DESC LIMIT 5", (user_id,))
                 user_ratings = cursor.fetchall()
                 cursor.execute("SELECT m.Movie_id, m.Name, m.Poster_URL FROM watchlist w JOIN movie m ON w.Movie_id = m.Movie_id WHERE w.User_id = %s ORDER BY w.Date_added DESC", (user_id,))
                 watchlist_movies = cursor.fetchall()
+                pending_ratings, pending_watchlist = write_queue.pending_for_user(user_id)
+                if pending_ratings or pending_watchlist:
+                    user_ratings, watchlist_movies = self.overlay_pending_writes(cursor, user_ratings, watchlist_movies, pending_ratings, pending_watchlist)
             context = {'user_data': user_data, 'user_ratings': user_ratings, 'watchlist_movies': watchlist_movies, 'success_message': success_message, 'error_message': error_message}
             self.serve_template('profile.html', context)
         finally:
             if connection: connection.close()
 
+    def overlay_pending_writes(self, cursor, user_ratings, watchlist_movies, pending_ratings, pending_watchlist):
+        # Read-your-writes: changes still queued in write_queue are not in MySQL yet.
+        cards = {card['Movie_id']: card for card in catalogue.get_movies(list(pending_ratings) + list(pending_watchlist), cursor)}
+        newest = [{'Movie_id': movie_id, 'movie_name': cards[movie_id]['Name'], 'stars': value}
+                  for movie_id, value in reversed(list(pending_ratings.items())) if movie_id in cards]
+        user_ratings = (newest + [r for r in user_ratings if r['Movie_id'] not in pending_ratings])[:5]
+        watchlist_movies = [w for w in watchlist_movies if pending_watchlist.get(w['Movie_id'], True)]
+        present = {w['Movie_id'] for w in watchlist_movies}
+        added = [{'Movie_id': movie_id, 'Name': cards[movie_id]['Name'], 'Poster_URL': cards[movie_id]['Poster_URL']}
+                 for movie_id, value in reversed(list(pending_watchlist.items())) if value and movie_id not in present and movie_id in cards]
+        return user_ratings, added + watchlist_movies
+
     def handle_update_profile(self, data):
         user_id = self.get_session_user()
         if not user_id: return self.redirect('/login')
@@ -215,7 +568,8 @@ class MyHandler(SimpleHTTPRequestHandler):
         
         update_fields, params = ["Name = %s"], [new_name]
         if new_password:
-            hashed_password = generate_password_hash(new_password)
+            try: hashed_password = password_hasher.hash(new_password)
+            except HashPoolBusy: return self.send_busy()
             update_fields.append("Password = %s")
             params.append(hashed_password)
         params.append(user_id)
@@ -244,35 +598,88 @@ class MyHandler(SimpleHTTPRequestHandler):
         search_query = query_params.get('search_query', [''])[0]
         genre_filter = query_params.get('genre', [''])[0]
         
-        conditions, params = [], []
-        if search_query:
-            conditions.append("m.Name LIKE %s")
-            params.append(f"%{search_query}%")
-        if genre_filter:
-            conditions.append("m.Genre_id = %s")
-            params.append(genre_filter)
-        where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+        try: genre_id = int(genre_filter) if genre_filter else None
+        except ValueError: genre_id = None
+        after = parse_browse_cursor(query_params.get('after', [''])[0])
+        before = parse_browse_cursor(query_params.get('before', [''])[0])
+        prev_cursor = next_cursor = None
         
         connection = connect_db()
         if not connection: return self.serve_template('browser.html', {'error_message': 'DB Error'})
         try:
             with connection.cursor() as cursor:
-                count_sql = f"SELECT COUNT(*) as total FROM movie m {where_clause}"
-                cursor.execute(count_sql, tuple(params))
-                total_movies = cursor.fetchone()['total']
-                total_pages = math.ceil(total_movies / MOVIES_PER_PAGE)
                 offset = (current_page - 1) * MOVIES_PER_PAGE
-                movies_sql = f"SELECT m.Movie_id, m.Name, m.Release_year, m.Duration, m.Poster_URL, g.Title AS Genre, p.Platformname AS Platform FROM movie m JOIN genre g ON m.Genre_id = g.Genre_id JOIN platform p ON m.Platform_id = p.Platform_id {where_clause} ORDER BY m.Release_year DESC LIMIT %s OFFSET %s"
-                final_params = tuple(params) + (MOVIES_PER_PAGE, offset)
-                cursor.execute(movies_sql, final_params)
-                movies_list = cursor.fetchall()
-                cursor.execute("SELECT Genre_id, Title FROM genre ORDER BY Title")
-                available_genres = cursor.fetchall()
-            context = {'movies': movies_list, 'available_genres': available_genres, 'search_query': search_query, 'selected_genre': genre_filter, 'current_page': current_page, 'total_pages': total_pages}
+                use_index = (search_query or genre_filter) and not (genre_filter and genre_id is None)
+                if use_index:
+                    title_index.ensure_loaded(connection)
+                    page_ids, total_movies = title_index.search(search_query, genre_id, offset, MOVIES_PER_PAGE)
+                    movies_list = self.fetch_movies_by_ids(cursor, page_ids)
+                else:
+                    conditions, params = [], []
+                    if search_query:
+                        conditions.append("m.Name LIKE %s")
+                        params.append(f"%{search_query}%")
+                    if genre_filter:
+                        conditions.append("m.Genre_id = %s")
+                        params.append(genre_filter)
+                    count_key = (search_query, genre_filter)
+                    with browse_counts_lock: cached_count = browse_counts.get(count_key)
+                    if cached_count and cached_count[0] > time.monotonic():
+                        total_movies = cached_count[1]
+                    else:
+                        where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+                        cursor.execute(f"SELECT COUNT(*) as total FROM movie m {where_clause}", tuple(params))
+                        total_movies = cursor.fetchone()['total']
+                        with browse_counts_lock: browse_counts[count_key] = (time.monotonic() + BROWSE_COUNT_TTL, total_movies)
+
+                    if after or before or offset == 0:
+                        page_ids = self.browse_keyset_ids(cursor, conditions, params, after, before, MOVIES_PER_PAGE)
+                    else:
+                        # Numbered page links still use OFFSET over the same order.
+                        where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+                        cursor.execute(f"SELECT m.Movie_id FROM movie m {where_clause} ORDER BY m.Release_year IS NULL, m.Release_year DESC, m.Movie_id DESC LIMIT %s OFFSET %s",
+                                       tuple(params) + (MOVIES_PER_PAGE, offset))
+                        page_ids = [row['Movie_id'] for row in cursor.fetchall()]
+                    movies_list = self.fetch_movies_by_ids(cursor, page_ids)
+                    if movies_list:
+                        prev_cursor, next_cursor = browse_cursor(movies_list[0]), browse_cursor(movies_list[-1])
+                total_pages = math.ceil(total_movies / MOVIES_PER_PAGE)
+                available_genres = catalogue.genres(cursor)
+            context = {'movies': movies_list, 'available_genres': available_genres, 'search_query': search_query, 'selected_genre': genre_filter, 'current_page': current_page, 'total_pages': total_pages, 'prev_cursor': prev_cursor, 'next_cursor': next_cursor}
             self.serve_template('browser.html', context)
         finally:
             if connection: connection.close()
 
+    def browse_keyset_ids(self, cursor, conditions, params, after, before, limit):
+        # Keyset pagination in Release_year DESC, Movie_id DESC order with undated
+        # movies last: next/prev links carry the boundary row, so MySQL seeks to it
+        # instead of reading and discarding OFFSET rows. Dated and undated movies
+        # are separate range scans on movie_release_year_id (see create_indexes.py),
+        # which keeps NULL years reachable without an ORDER BY ... IS NULL filesort.
+        def segment(dated, bound, bound_params, order, n):
+            where = conditions + ["m.Release_year IS NOT NULL" if dated else "m.Release_year IS NULL"] + bound
+            order_by = f"m.Release_year {order}, m.Movie_id {order}" if dated else f"m.Movie_id {order}"
+            cursor.execute(f"SELECT m.Movie_id FROM movie m WHERE {' AND '.join(where)} ORDER BY {order_by} LIMIT %s",
+                           tuple(params) + tuple(bound_params) + (n,))
+            return [row['Movie_id'] for row in cursor.fetchall()]
+
+        if before:
+            year, movie_id = before
+            if year is None:
+                ids = segment(False, ["m.Movie_id > %s"], [movie_id], "ASC", limit)
+                if len(ids) < limit: ids += segment(True, [], [], "ASC", limit - len(ids))
+            else:
+                ids = segment(True, ["(m.Release_year > %s OR (m.Release_year = %s AND m.Movie_id > %s))"], [year, year, movie_id], "ASC", limit)
+            return ids[::-1]
+        if after and after[0] is None:
+            return segment(False, ["m.Movie_id < %s"], [after[1]], "DESC", limit)
+        if after:
+            ids = segment(True, ["(m.Release_year < %s OR (m.Release_year = %s AND m.Movie_id < %s))"], [after[0], after[0], after[1]], "DESC", limit)
+        else:
+            ids = segment(True, [], [], "DESC", limit)
+        if len(ids) < limit: ids += segment(False, [], [], "DESC", limit - len(ids))
+        return ids
+
     def handle_movie_details(self):
         parsed_path = urllib.parse.urlparse(self.path)
         query_params = urllib.parse.parse_qs(parsed_path.query)
@@ -285,12 +692,10 @@ class MyHandler(SimpleHTTPRequestHandler):
         if not connection: return self.serve_template('movie_details.html', {'error_message': 'DB Error'})
         try:
             with connection.cursor() as cursor:
-                cursor.execute("SELECT m.*, g.Title AS Genre, p.Platformname AS Platform FROM movie m LEFT JOIN genre g ON m.Genre_id = g.Genre_id LEFT JOIN platform p ON m.Platform_id = p.Platform_id WHERE m.Movie_id = %s", (movie_id,))
-                movie_details = cursor.fetchone()
+                movie_details = catalogue.get_movie(movie_id, cursor)
                 similar_movies = []
                 if movie_details:
-                    cursor.execute("SELECT m.*, g.Title as Genre, p.Platformname as Platform FROM movie_similarity ms JOIN movie m ON m.Movie_id = ms.movie_id_2 LEFT JOIN genre g ON m.Genre_id = g.Genre_id LEFT JOIN platform p ON m.Platform_id = p.Platform_id WHERE ms.movie_id_1 = %s AND m.Movie_id != %s ORDER BY ms.similarity_score DESC LIMIT 4", (movie_id, movie_id))
-                    similar_movies = cursor.fetchall()
+                    similar_movies = self.fetch_movies_by_ids(cursor, self.get_similar_movie_ids(cursor, movie_id, 4))
             context = {'movie': movie_details, 'similar_movies': similar_movies}
             self.serve_template('movie_details.html', context)
         finally:
@@ -305,19 +710,16 @@ class MyHandler(SimpleHTTPRequestHandler):
             if not (1 <= rating_value <= 5): raise ValueError()
         except (ValueError, IndexError):
             self.send_response(400); self.end_headers(); return self.wfile.write(b'Invalid data')
-        
-        connection = connect_db()
-        if not connection: return self.send_error(500, "DB Error")
-        try:
-            with connection.cursor() as cursor:
-                sql = "INSERT INTO rating (User_id, Movie_id, Rating_value) VALUES (%s, %s, %s) ON DUPLICATE KEY UPDATE Rating_value = VALUES(Rating_value)"
-                cursor.execute(sql, (user_id, movie_id, rating_value))
-            connection.commit()
-            self.send_response(200); self.send_header('Content-type', 'text/plain; charset=utf-8'); self.end_headers(); self.wfile.write(b'Success')
-        except pymysql.MySQLError as e:
-            print(f"Rating Error: {e}"); self.send_error(500, "DB Error")
-        finally:
-            if connection: connection.close()
+
+        # Durable once the local log is fsynced; the write-behind flusher upserts
+        # the row and drops the user's precomputed lists in its next batch.
+        try: write_queue.put_rating(user_id, movie_id, rating_value)
+        except OSError as e:
+            print(f"Rating Error: {e}"); return self.send_error(500, "Write Error")
+        collab_model.update_rating(user_id, movie_id, rating_value)
+        mf_model.mark_user_stale(user_id)
+        rec_cache.invalidate_user(user_id)
+        self.send_response(200); self.send_header('Content-type', 'text/plain; charset=utf-8'); self.end_headers(); self.wfile.write(b'Success')
 
     def handle_toggle_watchlist(self, data):
         user_id = self.get_session_user()
@@ -328,28 +730,32 @@ class MyHandler(SimpleHTTPRequestHandler):
         except (ValueError, IndexError):
             self.send_response(400); self.send_header('Content-type', 'application/json'); self.end_headers()
             return self.wfile.write(json.dumps({'error': 'Invalid Movie ID'}).encode('utf-8'))
-        connection = connect_db()
-        if not connection: return self.send_error(500, "DB Error")
-        try:
-            with connection.cursor() as cursor:
-                cursor.execute("SELECT Watchlist_id FROM watchlist WHERE User_id = %s AND Movie_id = %s", (user_id, movie_id))
-                if cursor.fetchone():
-                    cursor.execute("DELETE FROM watchlist WHERE User_id = %s AND Movie_id = %s", (user_id, movie_id))
-                    response_data = {'status': 'removed'}
-                else:
-                    cursor.execute("INSERT INTO watchlist (User_id, Movie_id) VALUES (%s, %s)", (user_id, movie_id))
-                    response_data = {'status': 'added'}
-            connection.commit()
-            self.send_response(200); self.send_header('Content-type', 'application/json'); self.end_headers()
-            self.wfile.write(json.dumps(response_data).encode('utf-8'))
-        finally:
-            if connection: connection.close()
+        present = write_queue.pending_watchlist(user_id, movie_id)
+        if present is None:
+            connection = connect_db()
+            if not connection: return self.send_error(500, "DB Error")
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT Watchlist_id FROM watchlist WHERE User_id = %s AND Movie_id = %s", (user_id, movie_id))
+                    present = cursor.fetchone() is not None
+            finally:
+                connection.close()
+        try: write_queue.put_watchlist(user_id, movie_id, not present)
+        except OSError as e:
+            print(f"Watchlist Error: {e}"); return self.send_error(500, "Write Error")
+        rec_cache.invalidate_user(user_id)
+        self.send_response(200); self.send_header('Content-type', 'application/json'); self.end_headers()
+        self.wfile.write(json.dumps({'status': 'removed' if present else 'added'}).encode('utf-8'))
 
     def handle_recommend(self, data):
         user_id = self.get_session_user()
         if not user_id: return self.redirect('/login')
         movie_name = data.get('movie_name', [''])[0]
         algo_type = data.get('algo_type', [''])[0]
+        cached = rec_cache.get(user_id, algo_type, movie_name)
+        if cached is not None:
+            return self.serve_template('final.html', {'recommendations': cached})
+        cache_token = rec_cache.token(user_id)
         connection = connect_db()
         if not connection: return self.send_error(500, "DB Error")
         
@@ -360,41 +766,25 @@ class MyHandler(SimpleHTTPRequestHandler):
                     cursor.execute("SELECT Movie_id FROM movie WHERE Name = %s", (movie_name,))
                     movie = cursor.fetchone()
                     if movie:
-                        movie_id = movie['Movie_id']
-                        cursor.execute("SELECT m.*, g.Title as Genre, p.Platformname as Platform FROM movie_similarity ms JOIN movie m ON m.Movie_id = ms.movie_id_2 JOIN genre g ON m.Genre_id = g.Genre_id JOIN platform p ON m.Platform_id = p.Platform_id WHERE ms.movie_id_1 = %s AND m.Movie_id != %s ORDER BY ms.similarity_score DESC LIMIT 10", (movie_id, movie_id))
-                        recommendations = cursor.fetchall()
+                        recommendations = self.fetch_movies_by_ids(cursor, self.get_similar_movie_ids(cursor, movie['Movie_id'], 10))
                 
-                elif algo_type == 'collaborative':
-                    recommended_ids = self.get_collaborative_recommendations(user_id, connection)
-                    if recommended_ids:
-                        placeholders = ', '.join(['%s'] * len(recommended_ids))
-                        sql_details = f"SELECT m.*, g.Title as Genre, p.Platformname as Platform FROM movie m JOIN genre g ON m.Genre_id = g.Genre_id JOIN platform p ON m.Platform_id = p.Platform_id WHERE m.Movie_id IN ({placeholders})"
-                        cursor.execute(sql_details, recommended_ids)
-                        all_movies = {movie['Movie_id']: movie for movie in cursor.fetchall()}
-                        recommendations = [all_movies[rec_id] for rec_id in recommended_ids if rec_id in all_movies]
+                elif algo_type in ('collaborative', 'item_collaborative', 'collaborative_mf'):
+                    if algo_type == 'collaborative':
+                        recommended_ids = self.get_collaborative_recommendations(user_id, connection)
+                    elif algo_type == 'collaborative_mf':
+                        recommended_ids = self.get_mf_recommendations(user_id, cursor)
+                        if recommended_ids is None: recommended_ids = self.get_collaborative_recommendations(user_id, connection)
+                    else:
+                        recommended_ids = self.get_item_neighbour_recommendations(user_id, connection)
+                    recommendations = self.fetch_movies_by_ids(cursor, recommended_ids)
                 
                 elif algo_type == 'hybrid':
-                    content_recs, collab_recs = [], []
-                    cursor.execute("SELECT Movie_id FROM movie WHERE Name = %s", (movie_name,))
-                    movie_data_hybrid = cursor.fetchone()
-                    if movie_data_hybrid:
-                        target_movie_id_hybrid = movie_data_hybrid['Movie_id']
-                        cursor.execute("SELECT m.*, g.Title as Genre, p.Platformname as Platform FROM movie_similarity ms JOIN movie m ON m.Movie_id = ms.movie_id_2 JOIN genre g ON m.Genre_id = g.Genre_id JOIN platform p ON m.Platform_id = p.Platform_id WHERE ms.movie_id_1 = %s AND m.Movie_id != %s ORDER BY ms.similarity_score DESC LIMIT 5", (target_movie_id_hybrid, target_movie_id_hybrid))
-                        content_recs = cursor.fetchall()
-                    
-                    collab_ids = self.get_collaborative_recommendations(user_id, connection)
-                    if collab_ids:
-                        placeholders = ', '.join(['%s'] * len(collab_ids))
-                        sql_collab = f"SELECT m.*, g.Title as Genre, p.Platformname as Platform FROM movie m JOIN genre g ON m.Genre_id = g.Genre_id JOIN platform p ON m.Platform_id = p.Platform_id WHERE m.Movie_id IN ({placeholders})"
-                        cursor.execute(sql_collab, collab_ids[:5])
-                        all_collab_movies = {movie['Movie_id']: movie for movie in cursor.fetchall()}
-                        collab_recs = [all_collab_movies[rec_id] for rec_id in collab_ids[:5] if rec_id in all_collab_movies]
-                    
-                    combined_recs = {}
-                    for rec in content_recs + collab_recs:
-                        if rec['Movie_id'] not in combined_recs: combined_recs[rec['Movie_id']] = rec
-                    recommendations = list(combined_recs.values())
+                    recommendations = self.get_hybrid_recommendations(user_id, movie_name, connection, cursor)
 
+                if not recommendations:
+                    recommendations = self.get_popular_recommendations(user_id, cursor, movie_name)
+
+            rec_cache.put(user_id, algo_type, movie_name, recommendations, cache_token)
             self.serve_template('final.html', {'recommendations': recommendations})
         except Exception as e:
             print(f"An unexpected error occurred in handle_recommend: {e}")
@@ -402,33 +792,116 @@ class MyHandler(SimpleHTTPRequestHandler):
         finally:
             if connection: connection.close()
 
-    def get_collaborative_recommendations(self, target_user_id, connection):
+    def get_similar_movies(self, cursor, movie_id, limit):
+        neighbours = content_index.lookup(movie_id, limit)
+        if neighbours is not None: return neighbours
+        cursor.execute("SELECT movie_id_2, similarity_score FROM movie_similarity WHERE movie_id_1 = %s AND movie_id_2 != %s ORDER BY similarity_score DESC LIMIT %s", (movie_id, movie_id, limit))
+        return [(row['movie_id_2'], row['similarity_score']) for row in cursor.fetchall()]
+
+    def get_similar_movie_ids(self, cursor, movie_id, limit):
+        return [neighbour_id for neighbour_id, score in self.get_similar_movies(cursor, movie_id, limit)]
+
+    def get_hybrid_recommendations(self, user_id, movie_name, connection, cursor):
+        content_candidates, excluded_ids = [], set()
+        cursor.execute("SELECT Movie_id FROM movie WHERE Name = %s", (movie_name,))
+        seed_movie = cursor.fetchone()
+        if seed_movie:
+            content_candidates = self.get_similar_movies(cursor, seed_movie['Movie_id'], HYBRID_CANDIDATES)
+            excluded_ids.add(seed_movie['Movie_id'])
+        collaborative_candidates = self.get_collaborative_recommendations(user_id, connection, HYBRID_CANDIDATES, with_scores=True)
+        cursor.execute("SELECT Movie_id FROM rating WHERE User_id = %s UNION SELECT Movie_id FROM watchlist WHERE User_id = %s", (user_id, user_id))
+        excluded_ids.update(row['Movie_id'] for row in cursor.fetchall())
+        pending_ratings, pending_watchlist = write_queue.pending_for_user(user_id)
+        excluded_ids.update(pending_ratings)
+        excluded_ids.update(movie_id for movie_id, present in pending_watchlist.items() if present)
+        ranked_ids = rank_hybrid(content_candidates, collaborative_candidates, excluded_ids)
+        return self.fetch_movies_by_ids(cursor, ranked_ids)
+
+    def get_popular_recommendations(self, user_id, cursor, movie_name='', top_n=10):
+        # Cold-start users and empty results from any algorithm: best Bayesian
+        # scores in the seed movie's genre, topped up from the overall list.
+        genre_id, excluded_ids = None, set()
+        if movie_name:
+            cursor.execute("SELECT Movie_id, Genre_id FROM movie WHERE Name = %s", (movie_name,))
+            seed_movie = cursor.fetchone()
+            if seed_movie:
+                genre_id = seed_movie['Genre_id']
+                excluded_ids.add(seed_movie['Movie_id'])
+        cursor.execute("SELECT Movie_id FROM rating WHERE User_id = %s UNION SELECT Movie_id FROM watchlist WHERE User_id = %s", (user_id, user_id))
+        excluded_ids.update(row['Movie_id'] for row in cursor.fetchall())
+        pending_ratings, pending_watchlist = write_queue.pending_for_user(user_id)
+        excluded_ids.update(pending_ratings)
+        excluded_ids.update(movie_id for movie_id, present in pending_watchlist.items() if present)
+        with metrics.phase('popular', 'lookup'):
+            movie_ids = popular.top(cursor, genre_id, top_n, excluded_ids) if genre_id is not None else []
+            if len(movie_ids) < top_n:
+                movie_ids += popular.top(cursor, None, top_n - len(movie_ids), excluded_ids.union(movie_ids))
+        return self.fetch_movies_by_ids(cursor, movie_ids)
+
+    def user_has_ratings(self, user_id, connection):
+        pending_ratings, _ = write_queue.pending_for_user(user_id)
+        if pending_ratings: return True
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM rating WHERE User_id = %s LIMIT 1", (user_id,))
+            return cursor.fetchone() is not None
+
+    def fetch_movies_by_ids(self, cursor, movie_ids):
+        if not movie_ids: return []
+        return catalogue.get_movies(list(movie_ids), cursor)
+
+    def get_item_neighbour_recommendations(self, target_user_id, connection):
         try:
-            sql_query = "SELECT User_id, Movie_id, Rating_value FROM rating"
-            df = pd.read_sql(sql_query, connection)
-            if df.empty or target_user_id not in df['User_id'].unique(): return []
-            
-            user_movie_matrix = df.pivot_table(index='User_id', columns='Movie_id', values='Rating_value').fillna(0)
-            user_similarity_df = pd.DataFrame(cosine_similarity(user_movie_matrix), index=user_movie_matrix.index, columns=user_movie_matrix.index)
-            
-            similar_users = user_similarity_df[target_user_id].sort_values(ascending=False).iloc[1:]
-            if similar_users.empty: return []
-
-            recommended_movies, final_recommendations = {}, {}
-            for similar_user_id, similarity_score in similar_users.head(3).items():
-                if similarity_score < 0.2: continue
-                similar_user_ratings = user_movie_matrix.loc[similar_user_id]
-                for movie_id, rating in similar_user_ratings[similar_user_ratings > 3].items():
-                    if movie_id not in recommended_movies: recommended_movies[movie_id] = []
-                    recommended_movies[movie_id].append(rating * similarity_score)
-            
-            watched_movie_ids = user_movie_matrix.loc[target_user_id][user_movie_matrix.loc[target_user_id] > 0].index
-            for movie_id, scores in recommended_movies.items():
-                if movie_id not in watched_movie_ids:
-                    final_recommendations[movie_id] = sum(scores) / len(scores)
+            with connection.cursor() as cursor:
+                cursor.execute("""SELECT n.neighbour_id, SUM(n.similarity_score * r.Rating_value) AS score
+                    FROM rating r JOIN movie_cf_neighbours n ON n.movie_id = r.Movie_id
+                    WHERE r.User_id = %s AND r.Rating_value > 3
+                      AND n.neighbour_id NOT IN (SELECT Movie_id FROM rating WHERE User_id = %s)
+                    GROUP BY n.neighbour_id ORDER BY score DESC LIMIT 10""", (target_user_id, target_user_id))
+                return [row['neighbour_id'] for row in cursor.fetchall()]
+        except pymysql.MySQLError as e:
+            print(f"Error in item neighbour recommendations: {e}")
+            return []
+
+    def get_mf_recommendations(self, user_id, cursor, top_n=10):
+        # The user's current ratings exclude watched movies and drive the fold-in
+        # when they rated after training; queued writes count as rated too.
+        cursor.execute("SELECT Rating_id, Movie_id, Rating_value FROM rating WHERE User_id = %s", (user_id,))
+        rows = cursor.fetchall()
+        ratings = {row['Movie_id']: row['Rating_value'] for row in rows}
+        pending_ratings, _ = write_queue.pending_for_user(user_id)
+        ratings.update(pending_ratings)
+        newest_rating_id = max((row['Rating_id'] for row in rows), default=0)
+        with metrics.phase('collaborative_mf', 'score'):
+            return mf_model.recommend(user_id, ratings, newest_rating_id, top_n)
+
+    def get_precomputed_recommendations(self, target_user_id, connection, algo_type='collaborative'):
+        # Lists written by generate_user_recommendations.py; handle_rating deletes
+        # the user's rows, so anything still here reflects their current ratings.
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT movie_ids FROM user_recommendations WHERE User_id = %s AND algo_type = %s AND generated_at > NOW() - INTERVAL %s SECOND", (target_user_id, algo_type, PRECOMPUTED_MAX_AGE))
+                row = cursor.fetchone()
+            return json.loads(row['movie_ids']) if row else None
+        except pymysql.MySQLError:
+            return None
 
-            sorted_recs = sorted(final_recommendations.items(), key=lambda item: item[1], reverse=True)
-            return [movie_id for movie_id, score in sorted_recs[:10]]
+    def get_collaborative_recommendations(self, target_user_id, connection, top_n=10, with_scores=False):
+        with metrics.phase('collaborative', 'precomputed_lookup'):
+            precomputed = self.get_precomputed_recommendations(target_user_id, connection)
+        # A list shorter than top_n may have been cut at generation time, so
+        # only trust it when it covers the request; otherwise score live.
+        if precomputed is not None and len(precomputed) >= top_n:
+            precomputed = precomputed[:top_n]
+            # Stored lists carry only their order, so rank stands in for the score.
+            return [(movie_id, float(len(precomputed) - rank)) for rank, movie_id in enumerate(precomputed)] if with_scores else precomputed
+        try:
+            # The model has nothing to say about a user with no ratings, so don't
+            # load the whole rating table just to find that out.
+            if not collab_model.loaded and not self.user_has_ratings(target_user_id, connection): return []
+            with metrics.phase('collaborative', 'model_load'):
+                collab_model.ensure_loaded(connection)
+            with metrics.phase('collaborative', 'score'):
+                return collab_model.recommend(target_user_id, top_n, with_scores)
         except Exception as e:
             print(f"Error in collaborative filtering: {e}")
             return []
@@ -449,6 +922,10 @@ class MyHandler(SimpleHTTPRequestHandler):
             self.handle_admin_movie_form_for_edit()
         elif path_only == '/admin/users':
             self.handle_admin_list_users()
+        elif path_only == '/admin/metrics':
+            self.send_body(metrics.render().encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8', 'no-store')
+        elif path_only == '/admin/models':
+            self.send_json(self.model_status())
         else:
             self.send_error(404, 'Admin Page Not Found')
 
@@ -462,6 +939,8 @@ class MyHandler(SimpleHTTPRequestHandler):
             '/admin/movie/delete': self.handle_admin_delete_movie,
             '/admin/user/toggle_admin': self.handle_admin_toggle_admin,
             '/admin/user/delete': self.handle_admin_delete_user,
+            '/admin/models/reload': self.handle_admin_reload_models,
+            '/admin/models/rollback': self.handle_admin_rollback_model,
         }
         handler = admin_post_routes.get(path_only)
         if path_only.startswith('/admin/movie/delete') or path_only.startswith('/admin/user/'):
@@ -471,6 +950,35 @@ class MyHandler(SimpleHTTPRequestHandler):
         else:
             self.send_error(404, "Admin POST path not found")
 
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def model_status(self):
+        return {model.name: {'loaded': model.version, 'current': model_registry.current_version(model.name, model.registry_dir),
+                             'versions': model_registry.versions(model.name, model.registry_dir)} for model in hot_models}
+
+    def handle_admin_reload_models(self, data):
+        request_model_reload()
+        self.send_json({'status': 'reload scheduled', 'models': self.model_status()}, 202)
+
+    def handle_admin_rollback_model(self, data):
+        name = data.get('name', [''])[0]
+        version = data.get('version', [None])[0]
+        model = next((model for model in hot_models if model.name == name), None)
+        if model is None: return self.send_json({'error': f"Unknown model {name}"}, 404)
+        try:
+            version = model_registry.rollback(name, version, model.registry_dir)
+        except model_registry.ModelRegistryError as e:
+            return self.send_json({'error': str(e)}, 409)
+        request_model_reload()
+        self.send_json({'status': f"{name} rolled back to {version}", 'models': self.model_status()}, 202)
+
     def handle_admin_list_movies(self):
         connection = connect_db()
         if not connection: return self.serve_template('admin_movies.html', {'error_message': 'DB Error'})
@@ -487,10 +995,8 @@ class MyHandler(SimpleHTTPRequestHandler):
         if not connection: return self.serve_template('admin_movie_form.html', {'error_message': 'DB Error'})
         try:
             with connection.cursor() as cursor:
-                cursor.execute("SELECT * FROM genre ORDER BY Title")
-                genres = cursor.fetchall()
-                cursor.execute("SELECT * FROM platform ORDER BY Platformname")
-                platforms = cursor.fetchall()
+                genres = catalogue.genres(cursor)
+                platforms = catalogue.platforms(cursor)
             self.serve_template('admin_movie_form.html', {'genres': genres, 'platforms': platforms, 'movie': {}})
         finally:
             if connection: connection.close()
@@ -512,7 +1018,13 @@ class MyHandler(SimpleHTTPRequestHandler):
             with connection.cursor() as cursor:
                 sql = "INSERT INTO movie (Name, Release_year, Duration, Description, Poster_URL, Genre_id, Platform_id) VALUES (%s, %s, %s, %s, %s, %s, %s)"
                 cursor.execute(sql, (name, release_year, duration, description, poster_url, genre_id, platform_id))
+                new_movie_id = cursor.lastrowid
+                cache_events.publish(cursor, 'movie', movie_id=new_movie_id)
             connection.commit()
+            invalidate_browse_counts()
+            catalogue.invalidate_movie(new_movie_id)
+            title_index.upsert({'Movie_id': new_movie_id, 'Name': name, 'Genre_id': genre_id, 'Release_year': release_year})
+            refresh_similarity_async(new_movie_id)
             self.redirect('/admin/movies')
         except pymysql.MySQLError as e:
             print(f"Admin add movie error: {e}")
@@ -532,10 +1044,8 @@ class MyHandler(SimpleHTTPRequestHandler):
             with connection.cursor() as cursor:
                 cursor.execute("SELECT * FROM movie WHERE Movie_id = %s", (movie_id_str,))
                 movie_data = cursor.fetchone()
-                cursor.execute("SELECT * FROM genre ORDER BY Title")
-                genres = cursor.fetchall()
-                cursor.execute("SELECT * FROM platform ORDER BY Platformname")
-                platforms = cursor.fetchall()
+                genres = catalogue.genres(cursor)
+                platforms = catalogue.platforms(cursor)
             if not movie_data:
                 return self.send_error(404, "Movie not found")
             self.serve_template('admin_movie_form.html', {'genres': genres, 'platforms': platforms, 'movie': movie_data})
@@ -564,7 +1074,14 @@ class MyHandler(SimpleHTTPRequestHandler):
             with connection.cursor() as cursor:
                 sql = "UPDATE movie SET Name = %s, Release_year = %s, Duration = %s, Description = %s, Poster_URL = %s, Genre_id = %s, Platform_id = %s WHERE Movie_id = %s"
                 cursor.execute(sql, (name, release_year, duration, description, poster_url, genre_id, platform_id, movie_id))
+                cache_events.publish(cursor, 'movie', movie_id=int(movie_id))
             connection.commit()
+            rec_cache.clear()
+            popular.invalidate()
+            invalidate_browse_counts()
+            catalogue.invalidate_movie(movie_id)
+            title_index.upsert({'Movie_id': int(movie_id), 'Name': name, 'Genre_id': genre_id, 'Release_year': release_year})
+            refresh_similarity_async(movie_id)
             self.redirect('/admin/movies')
         except pymysql.MySQLError as e:
             print(f"Admin update movie error: {e}")
@@ -584,7 +1101,15 @@ class MyHandler(SimpleHTTPRequestHandler):
             with connection.cursor() as cursor:
                 sql = "DELETE FROM movie WHERE Movie_id = %s"
                 cursor.execute(sql, (movie_id,))
+                cache_events.publish(cursor, 'movie_deleted', movie_id=int(movie_id))
             connection.commit()
+            collab_model.invalidate()
+            rec_cache.clear()
+            popular.invalidate()
+            invalidate_browse_counts()
+            catalogue.invalidate_movie(movie_id)
+            title_index.remove(int(movie_id))
+            refresh_similarity_async(movie_id, deleted=True)
             self.redirect('/admin/movies')
         except pymysql.MySQLError as e:
             print(f"Admin delete movie error: {e}")
@@ -647,7 +1172,10 @@ class MyHandler(SimpleHTTPRequestHandler):
             
                 sql = "DELETE FROM users WHERE User_id = %s"
                 cursor.execute(sql, (target_user_id,))
+                cache_events.publish(cursor, 'user_deleted', int(target_user_id))
             connection.commit()
+            collab_model.invalidate()
+            rec_cache.invalidate_user(int(target_user_id))
             self.redirect('/admin/users')
         except pymysql.MySQLError as e:
             print(f"Admin delete user error: {e}")
@@ -655,16 +1183,109 @@ class MyHandler(SimpleHTTPRequestHandler):
         finally:
             if connection: connection.close()
 
+def run_server(args, reuse_port=False, worker=0):
+    global session_store
+    session_store = create_session_store(args.session_store, args.session_db)
+    write_queue.start(os.path.join(args.write_log_dir, f"worker-{worker}.log"))
+
+    connection = connect_db()
+    if connection:
+        try:
+            with connection.cursor() as cursor:
+                for table, name, _ in create_indexes.missing_indexes(cursor):
+                    print(f"Index {name} on {table} is missing; run create_indexes.py.")
+            # Started before the loads below, so nothing committed in between is missed.
+            if cache_events.enabled:
+                try: cache_listener.start(connection)
+                except pymysql.MySQLError as e: print(f"Cross-worker cache invalidation disabled: {e}")
+            with connection.cursor() as cursor: catalogue.load(cursor)
+            title_index.build(connection)
+        finally:
+            connection.close()
+    # The first load happens before the socket opens, so no request pays for it.
+    reload_models(wait=True)
+    signal.signal(signal.SIGHUP, lambda signum, frame: reload_models())
+
+    # Every prefork worker binds its own listening socket to the same port;
+    # with SO_REUSEPORT the kernel spreads incoming connections across them.
+    HTTPServer.allow_reuse_port = reuse_port
+    server_address = ("", args.port)
+    if args.threads > 0:
+        httpd = PooledHTTPServer(server_address, MyHandler, args.threads, args.queue_size)
+    else:
+        httpd = HTTPServer(server_address, MyHandler)
+    print(f"Server running on http://localhost:{args.port} (pid {os.getpid()})")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\nServer stopped.")
+        httpd.server_close()
+        try: write_queue.stop()
+        except Exception as e: print(f"Unflushed writes stay in {write_queue.log_path} for the next start: {e}")
+
+
+def run_prefork(args):
+    global prefork_parent
+    children = []
+    parent = os.getpid()
+    cache_events.enabled = True
+    for worker in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                prefork_parent = parent
+                signal.signal(signal.SIGTERM, signal.default_int_handler)
+                # Ignored until run_server installs its reload handler; the default would kill the worker.
+                signal.signal(signal.SIGHUP, signal.SIG_IGN)
+                run_server(args, reuse_port=True, worker=worker)
+            finally:
+                os._exit(0)
+        children.append(pid)
+    def forward_reload(signum, frame):
+        for pid in children:
+            try: os.kill(pid, signal.SIGHUP)
+            except ProcessLookupError: pass
+    signal.signal(signal.SIGHUP, forward_reload)
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        for pid in children:
+            try: os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError: pass
+        for pid in children:
+            os.waitpid(pid, 0)
+        print("\nAll workers stopped.")
+
+
 if __name__ == "__main__":
     if not os.path.exists('templates'):
         print("Error: 'templates' directory not found.")
         exit(1)
     
-    server_address = ("", PORT)
-    httpd = HTTPServer(server_address, MyHandler)
-    print(f"Server running on http://localhost:{PORT}")
-    try:
-        httpd.serve_forever()
-    except KeyboardInterrupt:
-        print("\nServer stopped.")
-        httpd.server_close()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--threads', type=int, default=WORKER_THREADS, help='worker threads; 0 serves requests one at a time')
+    parser.add_argument('--queue-size', type=int, default=REQUEST_QUEUE_SIZE, help='accepted connections waiting for a worker')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes sharing the port via SO_REUSEPORT')
+    parser.add_argument('--session-store', choices=('memory', 'sqlite'), default='memory')
+    parser.add_argument('--session-db', default='sessions.db', help='SQLite file for --session-store sqlite')
+    parser.add_argument('--db', default=db_pool.DB_CONFIG['db'], help='MySQL database, e.g. movie_bench for load tests')
+    parser.add_argument('--write-log-dir', default=write_behind.LOG_DIR, help='append-only logs for queued ratings and watchlist changes')
+    parser.add_argument('--slow-query-ms', type=float, default=metrics.slow_query_seconds * 1000, help='log SQL statements slower than this')
+    args = parser.parse_args()
+    db_pool.DB_CONFIG['db'] = args.db
+    metrics.slow_query_seconds = args.slow_query_ms / 1000
+
+    # Apply writes acknowledged by the previous run before any worker starts its own log.
+    replayed = write_behind.replay_logs(args.write_log_dir)
+    if replayed: print(f"Replayed {replayed} pending writes from {args.write_log_dir}.")
+    db_pool.close_pool()
+
+    if args.workers > 1:
+        if args.session_store == 'memory':
+            print("Multiple workers need a shared session store; using --session-store sqlite.")
+            args.session_store = 'sqlite'
+        run_prefork(args)
+    else:
+        run_server(args)
@@ -0,0 +1,129 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+SESSION_TTL = 3600
+SWEEP_INTERVAL = 60
+SQLITE_PATH = 'sessions.db'
+
+
+class SessionStore:
+    # Interface shared by every backend. Sessions expire SESSION_TTL seconds
+    # after creation, matching the session_id cookie's max-age.
+    def __init__(self, ttl=SESSION_TTL, sweep_interval=SWEEP_INTERVAL):
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._sweeper = None
+
+    def get(self, session_id):
+        raise NotImplementedError
+
+    def create(self, data):
+        raise NotImplementedError
+
+    def delete(self, session_id):
+        raise NotImplementedError
+
+    def sweep(self):
+        raise NotImplementedError
+
+    def count(self):
+        raise NotImplementedError
+
+    def start_sweeper(self):
+        if self._sweeper is not None: return
+        def run():
+            while True:
+                time.sleep(self.sweep_interval)
+                try:
+                    self.sweep()
+                except Exception as e:
+                    print(f"Session sweep failed: {e}")
+        self._sweeper = threading.Thread(target=run, name="session-sweeper", daemon=True)
+        self._sweeper.start()
+
+
+class MemorySessionStore(SessionStore):
+    # Single-process store; use SQLiteSessionStore when running several workers.
+    def __init__(self, ttl=SESSION_TTL, sweep_interval=SWEEP_INTERVAL):
+        super().__init__(ttl, sweep_interval)
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None: return None
+            if entry[0] <= time.time():
+                del self._sessions[session_id]
+                return None
+            return entry[1]
+
+    def create(self, data):
+        session_id = str(uuid.uuid4())
+        with self._lock: self._sessions[session_id] = (time.time() + self.ttl, data)
+        return session_id
+
+    def delete(self, session_id):
+        with self._lock: self._sessions.pop(session_id, None)
+
+    def sweep(self):
+        now = time.time()
+        with self._lock:
+            expired = [session_id for session_id, (expires, _) in self._sessions.items() if expires <= now]
+            for session_id in expired:
+                del self._sessions[session_id]
+        return len(expired)
+
+    def count(self):
+        with self._lock: return len(self._sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    # Shared local backend: every worker process on the host opens the same
+    # WAL-mode database, so readers never block the single writer.
+    def __init__(self, path=SQLITE_PATH, ttl=SESSION_TTL, sweep_interval=SWEEP_INTERVAL):
+        super().__init__(ttl, sweep_interval)
+        self.path = path
+        self._local = threading.local()
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL)")
+        connection.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires)")
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, session_id):
+        row = self._connection().execute("SELECT data FROM sessions WHERE session_id = ? AND expires > ?", (session_id, time.time())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def create(self, data):
+        session_id = str(uuid.uuid4())
+        self._connection().execute("INSERT INTO sessions (session_id, data, expires) VALUES (?, ?, ?)", (session_id, json.dumps(data), time.time() + self.ttl))
+        return session_id
+
+    def delete(self, session_id):
+        self._connection().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def sweep(self):
+        return self._connection().execute("DELETE FROM sessions WHERE expires <= ?", (time.time(),)).rowcount
+
+    def count(self):
+        return self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def create_session_store(backend='memory', path=SQLITE_PATH, ttl=SESSION_TTL):
+    if backend == 'sqlite':
+        store = SQLiteSessionStore(path, ttl)
+    else:
+        store = MemorySessionStore(ttl)
+    store.start_sweeper()
+    return store
@@ -0,0 +1,80 @@
+import threading
+import numpy as np
+import model_registry
+
+INDEX_NAME = 'similarity_index'
+
+
+def write_index(sources, targets, scores, width, registry_dir=model_registry.REGISTRY_DIR):
+    # Layout: ids holds the sorted movie ids that own a row; neighbours and
+    # scores are fixed-width (rows x width) arrays sorted by score, padded
+    # with -1 / 0. Published as a new registry version; returns its name.
+    sources, targets, scores = np.asarray(sources), np.asarray(targets), np.asarray(scores)
+    order = np.lexsort((-scores, sources))
+    sources, targets, scores = sources[order], targets[order], scores[order]
+    ids, starts, counts = np.unique(sources, return_index=True, return_counts=True)
+    rank = np.arange(len(sources)) - np.repeat(starts, counts)
+    keep = rank < width
+    rows = np.repeat(np.arange(len(ids)), counts)[keep]
+
+    neighbour_ids = np.full((len(ids), width), -1, dtype=np.int64)
+    neighbour_scores = np.zeros((len(ids), width), dtype=np.float32)
+    neighbour_ids[rows, rank[keep]] = targets[keep]
+    neighbour_scores[rows, rank[keep]] = scores[keep]
+
+    return model_registry.publish(INDEX_NAME, {'ids': ids.astype(np.int64), 'neighbours': neighbour_ids, 'scores': neighbour_scores},
+                                  {'width': width, 'movies': len(ids)}, registry_dir)
+
+
+class SimilarityIndex:
+    # Memory-mapped read side. Pages are shared between every process mapping
+    # the same files, and a lookup is a binary search plus a row slice.
+    # reload() runs off the request path and swaps a single reference, so a
+    # request that already took the old arrays finishes on them.
+    def __init__(self, name=INDEX_NAME, registry_dir=model_registry.REGISTRY_DIR):
+        self.name = name
+        self.registry_dir = registry_dir
+        self._reload_lock = threading.Lock()
+        self._current = None
+        self.stale_ids, self.removed_ids = set(), set()
+        self.on_reload = None
+
+    @property
+    def version(self):
+        current = self._current
+        return current[0] if current else None
+
+    def reload(self, version=None):
+        with self._reload_lock:
+            if version is None: version = model_registry.current_version(self.name, self.registry_dir)
+            previous = self._current
+            if version is None or (previous is not None and previous[0] == version): return False
+            version, arrays, _ = model_registry.load(self.name, version, registry_dir=self.registry_dir)
+            self._current = (version, arrays['ids'], arrays['neighbours'], arrays['scores'])
+            # A newer build already reflects earlier edits; after a rollback keep
+            # answering edited movies from MySQL.
+            if previous is None or version > previous[0]:
+                self.stale_ids, self.removed_ids = set(), set()
+        if previous is not None and self.on_reload: self.on_reload()
+        return True
+
+    def mark_stale(self, movie_id, deleted=False):
+        # Movies changed since the index was built are answered from MySQL
+        # instead; deleted ones are also dropped from other movies' rows.
+        self.stale_ids.add(int(movie_id))
+        if deleted: self.removed_ids.add(int(movie_id))
+
+    def lookup(self, movie_id, n):
+        # Returns [(movie_id, score), ...] or None when the index cannot answer.
+        current = self._current
+        if current is None or movie_id in self.stale_ids: return None
+        _, ids, neighbours, scores = current
+        row = int(np.searchsorted(ids, movie_id))
+        if row >= len(ids) or ids[row] != movie_id: return None
+        row_ids, row_scores = neighbours[row], scores[row]
+        result = []
+        for neighbour_id, score in zip(row_ids.tolist(), row_scores.tolist()):
+            if neighbour_id < 0 or len(result) >= n: break
+            if neighbour_id != movie_id and neighbour_id not in self.removed_ids:
+                result.append((neighbour_id, score))
+        return result
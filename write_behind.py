@@ -0,0 +1,241 @@
+import glob
+import itertools
+import json
+import os
+import threading
+import time
+import pymysql
+import cache_events
+import popularity
+from db_pool import get_pool
+
+LOG_DIR = 'write_behind'
+FLUSH_INTERVAL = 0.05
+MAX_BATCH = 1000
+SYNC_RETRY_INTERVAL = 1.0
+RATING_SQL = "INSERT INTO rating (User_id, Movie_id, Rating_value) VALUES (%s, %s, %s) ON DUPLICATE KEY UPDATE Rating_value = VALUES(Rating_value)"
+WATCHLIST_ADD_SQL = "INSERT INTO watchlist (User_id, Movie_id) SELECT %s, %s FROM DUAL WHERE NOT EXISTS (SELECT 1 FROM watchlist WHERE User_id = %s AND Movie_id = %s)"
+WATCHLIST_REMOVE_SQL = "DELETE FROM watchlist WHERE User_id = %s AND Movie_id = %s"
+
+
+def _apply(batch):
+    ratings = [(user_id, movie_id, value) for (kind, user_id, movie_id), value in batch.items() if kind == 'rating']
+    added = [(user_id, movie_id, user_id, movie_id) for (kind, user_id, movie_id), value in batch.items() if kind == 'watchlist' and value]
+    removed = [(user_id, movie_id) for (kind, user_id, movie_id), value in batch.items() if kind == 'watchlist' and not value]
+    connection = get_pool().acquire()
+    try:
+        with connection.cursor() as cursor:
+            if ratings:
+                changes = popularity.read_rating_changes(cursor, ratings)
+                cursor.executemany(RATING_SQL, ratings)
+                try: popularity.apply_rating_changes(cursor, changes)
+                except pymysql.ProgrammingError as e: print(f"Popularity aggregates not updated; run generate_popularity.py: {e}")
+                users = sorted({user_id for user_id, _, _ in ratings})
+                try: cursor.execute(f"DELETE FROM user_recommendations WHERE User_id IN ({', '.join(['%s'] * len(users))})", users)
+                except pymysql.MySQLError: pass
+            if removed: cursor.executemany(WATCHLIST_REMOVE_SQL, removed)
+            if added: cursor.executemany(WATCHLIST_ADD_SQL, added)
+            # Other prefork workers pick these up from cache_events once this commits.
+            try:
+                if ratings: cache_events.publish_many(cursor, 'rating', ratings)
+                for user_id in sorted({user_id for user_id, _ in removed} | {user_id for user_id, _, _, _ in added}):
+                    cache_events.publish(cursor, 'user', user_id)
+            except pymysql.ProgrammingError as e: print(f"Cache events not published: {e}")
+        connection.commit()
+    finally:
+        connection.close()
+
+def apply_batch(batch):
+    try:
+        _apply(batch)
+    except pymysql.IntegrityError:
+        # One bad row (e.g. a movie deleted since the click) must not block the rest.
+        for key, value in batch.items():
+            try: _apply({key: value})
+            except pymysql.IntegrityError as e: print(f"Dropping write-behind entry {key}: {e}")
+
+def read_log(path, entries=None):
+    if entries is None: entries = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try: kind, user_id, movie_id, value = json.loads(line)
+            except ValueError: continue  # torn final line from a crash mid-write
+            key = (kind, user_id, movie_id)
+            entries.pop(key, None)
+            entries[key] = value
+    return entries
+
+def replay_logs(log_dir=LOG_DIR, max_batch=MAX_BATCH):
+    # Run once before any worker starts: applies whatever the previous run
+    # acknowledged but had not flushed, then removes the logs.
+    paths = sorted(glob.glob(os.path.join(log_dir, '*.log')))
+    entries = {}
+    for path in paths: read_log(path, entries)
+    items = list(entries.items())
+    for start in range(0, len(items), max_batch):
+        apply_batch(dict(items[start:start + max_batch]))
+    for path in paths + glob.glob(os.path.join(log_dir, '*.tmp')):
+        os.remove(path)
+    return len(items)
+
+def fsync_dir(path):
+    fd = os.open(path, os.O_RDONLY)
+    try: os.fsync(fd)
+    finally: os.close(fd)
+
+
+class WriteBehindQueue:
+    # Ratings and watchlist changes are appended to a local log and fsynced in
+    # groups before the request is answered, then applied to MySQL by a
+    # background writer in multi-row batches with one commit. Pending changes
+    # are keyed on (kind, user_id, movie_id) so repeated clicks coalesce to the
+    # last value; the log is rewritten down to the still-pending set after each flush.
+    def __init__(self, flush_interval=FLUSH_INTERVAL, max_batch=MAX_BATCH):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.log_path = None
+        self._log = None
+        self._pending = {}
+        self._inflight = {}
+        self._seq = 0
+        self._synced = 0
+        self._sync_error = None
+        self._failed_through, self._failure = 0, None
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self.on_flushed = None
+        self.counters = {'enqueued': 0, 'coalesced': 0, 'log_syncs': 0, 'log_sync_failures': 0, 'flushes': 0, 'flushed_rows': 0, 'flush_failures': 0}
+
+    def start(self, log_path):
+        os.makedirs(os.path.dirname(log_path) or '.', exist_ok=True)
+        self.log_path = log_path
+        self._log = open(log_path, 'a', encoding='utf-8')
+        threading.Thread(target=self._sync_loop, name="write-behind-sync", daemon=True).start()
+        threading.Thread(target=self._flush_loop, name="write-behind-flush", daemon=True).start()
+
+    def _put(self, kind, user_id, movie_id, value):
+        key = (kind, user_id, movie_id)
+        with self._cond:
+            if self._log is None: raise OSError("Write-behind queue is not started")
+            # Nothing is acknowledged again until the log can be synced.
+            if self._sync_error is not None: raise OSError(f"Write-behind log is not durable: {self._sync_error}")
+            if self._pending.pop(key, None) is not None: self.counters['coalesced'] += 1
+            self._pending[key] = value
+            self.counters['enqueued'] += 1
+            self._log.write(json.dumps([kind, user_id, movie_id, value]) + '\n')
+            self._log.flush()
+            self._seq += 1
+            seq = self._seq
+            self._cond.notify_all()
+            # Every writer that arrives while an fsync is running shares the next one.
+            while self._synced < seq: self._cond.wait()
+            if seq <= self._failed_through: raise OSError(f"Write-behind log sync failed: {self._failure}")
+
+    def put_rating(self, user_id, movie_id, rating_value):
+        self._put('rating', user_id, movie_id, rating_value)
+
+    def put_watchlist(self, user_id, movie_id, present):
+        self._put('watchlist', user_id, movie_id, bool(present))
+
+    def _sync_loop(self):
+        # fsync runs outside _cond so pending_for_user and friends never wait
+        # on the disk. The fd is duplicated under the lock because _checkpoint
+        # may swap the log file meanwhile; everything up to target went to it.
+        while True:
+            with self._cond:
+                while self._synced == self._seq and self._sync_error is None: self._cond.wait()
+                if self._synced == self._seq: self._cond.wait(SYNC_RETRY_INTERVAL)
+                target, fd = self._seq, os.dup(self._log.fileno())
+            try:
+                os.fsync(fd)
+                error = None
+            except OSError as e:
+                error = e
+            finally:
+                os.close(fd)
+            with self._cond:
+                if error is None:
+                    self._sync_error = None
+                    self.counters['log_syncs'] += 1
+                else:
+                    if self._sync_error is None: print(f"Write-behind log sync failed, rejecting writes until it recovers: {error}")
+                    self._sync_error = error
+                    self._failed_through, self._failure = target, error
+                    self.counters['log_sync_failures'] += 1
+                self._synced = max(self._synced, target)
+                self._cond.notify_all()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Write-behind flush failed, will retry: {e}")
+
+    def flush(self):
+        with self._flush_lock:
+            with self._cond:
+                if not self._pending: return 0
+                batch = dict(itertools.islice(self._pending.items(), self.max_batch))
+                for key in batch: del self._pending[key]
+                self._inflight = batch
+            try:
+                apply_batch(batch)
+            except Exception:
+                with self._cond:
+                    # Values queued while this batch was in flight are newer and win.
+                    batch.update(self._pending)
+                    self._pending, self._inflight = batch, {}
+                    self.counters['flush_failures'] += 1
+                raise
+            with self._cond:
+                self._inflight = {}
+                self.counters['flushes'] += 1
+                self.counters['flushed_rows'] += len(batch)
+                self._checkpoint()
+            if self.on_flushed: self.on_flushed(batch)
+            return len(batch)
+
+    def _checkpoint(self):
+        # Called with _cond held: rewrite the log to hold only unflushed entries.
+        tmp_path = self.log_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for (kind, user_id, movie_id), value in self._pending.items():
+                f.write(json.dumps([kind, user_id, movie_id, value]) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.log_path)
+        fsync_dir(os.path.dirname(self.log_path) or '.')
+        self._log.close()
+        self._log = open(self.log_path, 'a', encoding='utf-8')
+        self._synced = self._seq
+        self._sync_error = None
+        self._cond.notify_all()
+
+    def stop(self):
+        while self._pending or self._inflight:
+            if not self.flush(): break
+
+    def pending_watchlist(self, user_id, movie_id):
+        key = ('watchlist', user_id, movie_id)
+        with self._cond:
+            if key in self._pending: return self._pending[key]
+            return self._inflight.get(key)
+
+    def pending_for_user(self, user_id):
+        # Queued changes for one user, oldest first, so pages can overlay them on what MySQL returns.
+        ratings, watchlist = {}, {}
+        with self._cond:
+            for entries in (self._inflight, self._pending):
+                for (kind, entry_user, movie_id), value in entries.items():
+                    if entry_user != user_id: continue
+                    target = ratings if kind == 'rating' else watchlist
+                    target.pop(movie_id, None)
+                    target[movie_id] = value
+        return ratings, watchlist
+
+    def stats(self):
+        with self._cond:
+            result = dict(self.counters, pending=len(self._pending), inflight=len(self._inflight))
+        return result